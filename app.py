@@ -442,7 +442,7 @@
 
 # # Summary metrics
 # c1, c2, c3 = st.columns([2,2,2])
-# c1.metric("Total lines", len(raw_text.splitlines()))
+# c1.metric("Total lines", df.attrs["line_count"])
 # c2.metric("Detected occurrences", len(df))
 # c3.metric("Filtered occurrences", len(filtered))
 
@@ -567,53 +567,270 @@
 Main Streamlit app that wires everything together.
 """
 
+import os
+from datetime import timedelta
+from functools import partial
+
 import streamlit as st
-import pandas as pd
-from errors_mapping import CATEGORY_MAPPING, get_all_suberrors
-from parser import extract_errors_from_log_text
-from charts import plot_pivot_time_series
-from table_utils import show_table
+from instrument import finish_run, recorded_run, stage, start_run
+from profiles import PROFILES
+from ingest import resolve_server_path, server_root
 
 st.set_page_config(page_title="Log Error Explorer (modular)", layout="wide")
 st.title("Log Error Explorer — modular project")
+# per-stage timings of this rerun, shown in the sidebar at the end of the script
+run = start_run("app")
 
 # Sidebar
 with st.sidebar:
     st.header("Upload & Options")
-    uploaded = st.file_uploader("Upload log file (.log/.txt)", type=["log", "txt", "text"])
+    # several files (e.g. one per worker) are merged by time, tagged with their source
+    uploaded = st.file_uploader("Upload log file(s) (.log/.txt, optionally compressed)", type=["log", "txt", "text", "gz", "bz2", "xz", "zst"], accept_multiple_files=True)
+    # server-side files only when an allowed root is configured, and only below it
+    allowed_root = server_root()
+    server_path = st.text_input(f"...or open a log file on this server (path under {allowed_root})").strip() if allowed_root else ""
+    follow = False
+    if server_path:
+        follow = st.checkbox("Follow the file as it grows", value=False)
+        if follow:
+            refresh_seconds = st.number_input("Refresh every (seconds)", min_value=1, max_value=3600, value=5, step=1)
+    log_format = st.selectbox("Log format", ["Auto-detect"] + list(PROFILES), help="Auto-detect picks the format whose timestamps parse on most of the first lines; a close vote falls back to python.")
     st.markdown("---")
     show_traceback_default = st.checkbox("Show tracebacks in details by default", value=False)
     enable_aggrid = st.checkbox("Enable AgGrid table (optional)", value=False)
     st.markdown("---")
     st.caption("Categories with count>0 are shown. Click to expand sub-errors (only sub-errors with count>0 appear).")
 
-if not uploaded:
+if not uploaded and not server_path:
     st.info("Upload a log file from the sidebar to start.")
     st.stop()
 
-raw_text = uploaded.getvalue().decode("utf-8", errors="replace")
-with st.spinner("Parsing..."):
-    df = extract_errors_from_log_text(raw_text)
+# pandas, numpy and the modules built on them load only once there is a log to show,
+# so the landing page answers quickly on a cold start
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from errors_mapping import CATEGORY_MAPPING  # noqa: E402
+from parser import PARSER_VERSION, detect_source_profile, group_occurrences, merge_sources, parse_sources, time_order_key, time_window  # noqa: E402
+from ingest import read_preview, source_compression  # noqa: E402
+from parse_cache import ParseCache, content_key  # noqa: E402
+from follow import LogFollower  # noqa: E402
+from log_index import LogIndex  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+from rollup import RollupCube, pick_resolution  # noqa: E402
+from charts import plot_pivot_time_series  # noqa: E402
+from table_utils import show_groups, show_table  # noqa: E402
+from exports import EXPORT_MIME, PARQUET_AVAILABLE, export_bytes  # noqa: E402
+from sql_engine import SAVED_QUERIES, SqlEngine  # noqa: E402
+
+@st.cache_resource
+def get_parse_cache() -> ParseCache:
+    # shared by all sessions; LOG_ANALYSER_CACHE_DIR enables the on-disk layer
+    max_mb = int(os.environ.get("LOG_ANALYSER_CACHE_MB", "1024"))
+    return ParseCache(max_bytes=max_mb << 20, cache_dir=os.environ.get("LOG_ANALYSER_CACHE_DIR") or None)
+
+
+@st.cache_resource
+def get_log_index() -> LogIndex:
+    default_db = os.path.join(os.path.expanduser("~"), ".cache", "log-analyser", "index.sqlite3")
+    return LogIndex(os.environ.get("LOG_ANALYSER_INDEX_DB") or default_db)
+
+
+def source_names(files) -> list:
+    """Upload names, numbered where several files share one."""
+    names = []
+    for f in files:
+        name, n = f.name, 1
+        while name in names:
+            n += 1
+            name = f"{f.name} ({n})"
+        names.append(name)
+    return names
+
+
+# None: detected per log. A chosen profile is part of every cache key.
+profile = PROFILES.get(log_format)
+profile_key = "" if profile is None else f":{profile.name}"
+
+if server_path:
+    resolved_path = resolve_server_path(server_path, allowed_root)
+    if resolved_path is None or not os.path.isfile(resolved_path):
+        st.error(f"Not a file under {allowed_root}: {server_path}")
+        st.stop()
+    server_path = resolved_path
+
+if server_path and follow and source_compression(server_path):
+    st.error("Compressed logs cannot be followed; uncheck 'Follow' to load it.")
+    st.stop()
+
+if server_path and follow:
+    follower = st.session_state.get("follower")
+    if follower is None or follower.path != server_path or follower.fixed_profile is not profile:
+        follower = st.session_state["follower"] = LogFollower(server_path, profile=profile)
+    with st.spinner("Reading new lines..."), stage("load"):
+        follower.poll()
+    df = follower.frame
+    # a provisional last entry adds rows without moving the offset; the rows of one
+    # generation only grow, so generation and row count name the data
+    data_key = f"follow:{server_path}:{follower.generation}:{len(df)}{profile_key}"
+    # the rows of one generation only grow: derived structures are extended, not rebuilt
+    base_key = f"follow:{server_path}:{follower.generation}{profile_key}"
+    # server files are never echoed into the page
+    preview_bytes = None
+
+    @st.fragment(run_every=refresh_seconds)
+    def watch_followed_file():
+        # cheap size check; only a file that grew, or went quiet with its last entry still
+        # held back, triggers a full rerun (and a poll)
+        if follower.has_new_data():
+            st.rerun()
+
+    watch_followed_file()
+    st.caption(f"Following {server_path}: {follower.offset} bytes parsed, refreshing every {refresh_seconds}s.")
+elif server_path:
+    # the on-disk index parses a file once (resuming if it grew); the memory cache
+    # keeps reruns from reloading it
+    stat = os.stat(server_path)
+    index_key = f"{os.path.abspath(server_path)}:{stat.st_size}:{stat.st_mtime_ns}-v{PARSER_VERSION}{profile_key}"
+    with st.spinner("Loading / indexing..."), stage("load"):
+        df = get_parse_cache().get_or_parse(server_path, partial(get_log_index().load_or_parse, profile=profile), key=index_key)
+    data_key = base_key = index_key
+    preview_bytes = None
+else:
+    # zero-copy views of the uploads; the parser scans bytes and decodes only captured fields
+    buffers = [f.getbuffer() for f in uploaded]
+    names = source_names(uploaded)
+    # hash each upload once per session, not on every rerun
+    upload_ids = [getattr(f, "file_id", None) or (f.name, f.size) for f in uploaded]
+    known = st.session_state.get("upload_keys", {})
+    content_keys = [known.get(i) or content_key(buf) for i, buf in zip(upload_ids, buffers)]
+    st.session_state["upload_keys"] = dict(zip(upload_ids, content_keys))
+    keys = [key + profile_key for key in content_keys]
+    cache = get_parse_cache()
+    with st.spinner("Parsing..."), stage("load"):
+        # each file is cached on its own; the ones not seen yet are parsed concurrently
+        frames = [cache.get(key) for key in keys]
+        missing = [i for i, f in enumerate(frames) if f is None]
+        for i, parsed in zip(missing, parse_sources([buffers[i] for i in missing], profile=profile)):
+            cache.put(keys[i], parsed)
+            frames[i] = parsed
+    if len(frames) == 1:
+        df = frames[0]
+        data_key = keys[0]
+    else:
+        data_key = content_key("\n".join(names + keys).encode("utf-8"))
+        merged = st.session_state.get("merged_upload")
+        if merged is None or merged[0] != data_key:
+            with st.spinner("Merging..."), stage("merge"):
+                merged = st.session_state["merged_upload"] = (data_key, merge_sources(frames, names))
+        df = merged[1]
+        st.caption(f"{len(frames)} logs merged by time.")
+    base_key = data_key
+    preview_bytes = read_preview(buffers[0], 801)
+
+# which format each log was read as; detection reads only its first lines, once per log
+if profile is None:
+    detected = st.session_state.get("detected_formats")
+    if detected is None or detected[0] != base_key:
+        sources = [(server_path, server_path)] if server_path else list(zip(names, buffers))
+        detected = st.session_state["detected_formats"] = (base_key, [(name, *detect_source_profile(src)) for name, src in sources])
+    st.caption("Log format (detected): " + ", ".join(p.name if len(detected[1]) == 1 else f"{name}: {p.name}" for name, p, _ in detected[1]))
+    for name, p, clear in detected[1]:
+        if not clear:
+            st.warning(f"{name}: the log format is unclear (mixed lines), read as {p.name}. Pick the format in the sidebar if the counts look wrong.")
+else:
+    st.caption(f"Log format: {profile.name}")
 
 if df.empty:
-    st.warning("No exception-like entries detected in the uploaded file.")
-    st.code(raw_text[:800] + ("\n..." if len(raw_text) > 800 else ""))
+    st.warning("No exception-like entries detected in the log.")
+    if preview_bytes is not None:
+        st.code(preview_bytes[:800].decode("utf-8", errors="replace") + ("\n..." if len(preview_bytes) > 800 else ""))
     st.stop()
 
-# prepare counts
-all_subs = get_all_suberrors()
-sub_counts_raw = df["exception"].value_counts().to_dict()
-sub_counts_full = {s: int(sub_counts_raw.get(s, 0)) for s in all_subs}
-cat_totals = {k: sum(sub_counts_full.get(sub, 0) for sub in v["errors"]) for k, v in CATEGORY_MAPPING.items()}
+def get_derived(name, build, extend=None):
+    """
+    Per-session memo for structures built once per parsed log (indexes, rollups). When the
+    log only grew (follow mode), `extend(value, new_rows)` adds the new rows to it instead.
+    """
+    store = st.session_state.setdefault("derived", {})
+    if store.get("base_key") != base_key:
+        store.clear()
+        store["base_key"] = base_key
+    rows, value = store.get(name, (None, None))
+    if rows != len(df):
+        if rows is not None and rows < len(df) and extend is not None:
+            with stage(f"extend {name}", rows=len(df) - rows):
+                value = extend(value, df.iloc[rows:])
+        else:
+            value = build()
+        store[name] = (len(df), value)
+    return value
+
+
+n_ts_fallback = df.attrs.get("timestamp_fallbacks", 0)
+if n_ts_fallback:
+    st.caption(f"{n_ts_fallback} timestamp(s) did not match the log format's timestamp layout and were parsed with the slow fallback.")
+
+# time range: parsed rows are in time order (see time_order_key), so a window is two binary
+# searches and a zero-copy slice of df; the counts, facets, timelines and table below use it
+time_keys = get_derived("time_keys", lambda: time_order_key(df["timestamp"]),
+                        lambda keys, new: np.concatenate([keys, time_order_key(new["timestamp"], after=keys[-1] if len(keys) else None)]))
+n_untimed = int(np.searchsorted(time_keys, np.iinfo(np.int64).min, side="right"))
+window_rows = slice(0, len(df))
+if n_untimed < len(df) and time_keys[-1] > time_keys[n_untimed]:
+    t_first = pd.Timestamp(time_keys[n_untimed]).floor("us").to_pydatetime()
+    t_last = pd.Timestamp(time_keys[-1]).ceil("us").to_pydatetime()
+    # the window outlives a log that grows (follow mode): a zoomed-in window is kept, clamped
+    # to the new span, and the full range keeps following the log; another log starts full
+    span_seen = st.session_state.get("time_range_span")
+    chosen = st.session_state.get("time_range")
+    if chosen is None or span_seen is None or span_seen[0] != base_key or tuple(chosen) == span_seen[1]:
+        chosen = (t_first, t_last)
+    else:
+        low = min(max(chosen[0], t_first), t_last)
+        chosen = (low, min(max(chosen[1], low), t_last))
+    st.session_state["time_range"] = chosen
+    st.session_state["time_range_span"] = (base_key, (t_first, t_last))
+    time_range = st.slider("Time range", min_value=t_first, max_value=t_last,
+                           step=timedelta(seconds=1), format="YYYY-MM-DD HH:mm:ss", key="time_range")
+    if tuple(time_range) != (t_first, t_last):
+        window_rows = time_window(time_keys, *time_range)
+window = df.iloc[window_rows] if window_rows != slice(0, len(df)) else df
+windowed = window is not df
+
+
+def count_sub_errors(frame):
+    return frame.groupby("category_key", observed=True)["exception"].value_counts().loc[lambda c: c > 0]
+
+
+def add_counts(counts, more):
+    # most frequent first, as value_counts orders them
+    return counts.add(more, fill_value=0).astype(np.int64).sort_values(ascending=False, kind="stable")
+
+
+# prepare counts: every occurrence counts once, under the category its exception was classified into
+with stage("counts", rows=len(window)):
+    if windowed:
+        cat_counts = window["category_key"].value_counts()
+        sub_counts_by_cat = count_sub_errors(window)
+    else:
+        cat_counts = get_derived("cat_counts", lambda: df["category_key"].value_counts(),
+                                 lambda counts, new: add_counts(counts, new["category_key"].value_counts()))
+        sub_counts_by_cat = get_derived("sub_counts", lambda: count_sub_errors(df),
+                                        lambda counts, new: add_counts(counts, count_sub_errors(new)))
+    cat_totals = {k: int(v) for k, v in cat_counts.items() if v > 0}
 
 # UI: category buttons (only those with >0)
-visible_cat_keys = [k for k, v in cat_totals.items() if v > 0]
+visible_cat_keys = [k for k in CATEGORY_MAPPING if cat_totals.get(k, 0) > 0]
 cols = st.columns(min(6, max(1, len(visible_cat_keys))))
 
 if "sel_cat_key" not in st.session_state:
     st.session_state["sel_cat_key"] = None
 if "sel_subs" not in st.session_state:
     st.session_state["sel_subs"] = []
+if st.session_state["sel_cat_key"] not in cat_totals:
+    # nothing of the selected category in this log
+    st.session_state["sel_cat_key"] = None
+    st.session_state["sel_subs"] = []
 
 st.subheader("Categories (count > 0)")
 for idx, cat_key in enumerate(visible_cat_keys):
@@ -632,10 +849,12 @@ if st.session_state["sel_cat_key"]:
     active = st.session_state["sel_cat_key"]
     st.markdown(f"**Active category:** {CATEGORY_MAPPING[active]['category']} — {cat_totals[active]} occurrences")
     st.caption(CATEGORY_MAPPING[active]["description"])
-    available_subs = [s for s in CATEGORY_MAPPING[active]["errors"] if sub_counts_full.get(s, 0) > 0]
+    # exceptions seen in this category, as logged (qualified names included), most frequent first
+    sub_counts = {s: int(n) for s, n in sub_counts_by_cat[active].items()}
+    available_subs = list(sub_counts)
     if available_subs:
-        labeled = [f"{s} ({sub_counts_full[s]})" for s in available_subs]
-        prev = [f"{s} ({sub_counts_full[s]})" for s in st.session_state["sel_subs"] if s in available_subs]
+        labeled = [f"{s} ({sub_counts[s]})" for s in available_subs]
+        prev = [f"{s} ({sub_counts[s]})" for s in st.session_state["sel_subs"] if s in available_subs]
         chosen_labeled = st.multiselect("Select sub-error(s) to filter", labeled, default=prev)
         chosen_subs = [item.split(" (")[0] for item in chosen_labeled]
         st.session_state["sel_subs"] = chosen_subs
@@ -645,66 +864,125 @@ if st.session_state["sel_cat_key"]:
 
 st.markdown("---")
 search_input = st.text_input("Search exceptions, messages or modules (case-insensitive)")
-
-# Filtering
-filtered = df.copy()
-if st.session_state["sel_cat_key"]:
-    if st.session_state["sel_subs"]:
-        filtered = filtered[filtered["exception"].isin(st.session_state["sel_subs"])]
-    else:
-        subs_in_cat = CATEGORY_MAPPING[st.session_state["sel_cat_key"]]["errors"]
-        filtered = filtered[filtered["exception"].isin(subs_in_cat)]
-
-if search_input:
-    q = search_input.strip().lower()
-    filtered = filtered[
-        filtered["exception"].fillna("").str.lower().str.contains(q) |
-        filtered["exc_message"].fillna("").str.lower().str.contains(q) |
-        filtered["message"].fillna("").str.lower().str.contains(q) |
-        filtered["module"].fillna("").str.lower().str.contains(q)
-    ]
+# per-source facet over merged uploads; nothing selected shows every source
+sources = list(window["source"].cat.categories) if "source" in window.columns else []
+selected_sources = st.multiselect("Sources", sources) if len(sources) > 1 else []
+
+# Filtering: boolean row masks over the time window, applied once
+with stage("filter", rows=len(window)):
+    row_mask = np.ones(len(window), dtype=bool)
+    selected_exceptions = None
+    if st.session_state["sel_cat_key"]:
+        selected_exceptions = st.session_state["sel_subs"] or list(sub_counts_by_cat[st.session_state["sel_cat_key"]].index)
+        row_mask &= window["exception"].isin(selected_exceptions).to_numpy()
+
+    if selected_sources:
+        row_mask &= window["source"].isin(selected_sources).to_numpy()
+
+    if search_input:
+        q = search_input.strip().lower()
+        with stage("search", rows=len(df)):
+            # the index covers the whole log; its mask is cut to the window
+            row_mask &= get_derived("search_index", lambda: SearchIndex(df), lambda index, new: index.extend(new)).mask(q)[window_rows]
+
+    # no filter: the window itself, not a copy of it
+    filtered = window if row_mask.all() else window[row_mask]
+    # the same rows as positions in df, for callbacks that must not keep a copy alive
+    filtered_rows = window_rows if filtered is window else np.flatnonzero(row_mask) + window_rows.start
 
 # Stats
 c1, c2, c3 = st.columns([2,2,2])
-c1.metric("Total lines", len(raw_text.splitlines()))
+c1.metric("Total lines", df.attrs["line_count"])
 c2.metric("Detected occurrences", len(df))
 c3.metric("Filtered occurrences", len(filtered))
 
-# timelines
-st.subheader("Timelines (module / level / exception)")
-timeline_df = filtered.dropna(subset=["timestamp"]).copy()
-if not timeline_df.empty:
-    min_ts = timeline_df["timestamp"].min()
-    max_ts = timeline_df["timestamp"].max()
-    span_seconds = (max_ts - min_ts).total_seconds() if max_ts and min_ts else 0
-    if span_seconds <= 3600 * 6:
-        timeline_df["bucket"] = timeline_df["timestamp"].dt.floor("T")
-    elif span_seconds <= 3600 * 24 * 10:
-        timeline_df["bucket"] = timeline_df["timestamp"].dt.floor("H")
-    else:
-        timeline_df["bucket"] = timeline_df["timestamp"].dt.floor("D")
-
-    agg_module = timeline_df.groupby(["bucket", "module"]).size().reset_index(name="count")
-    agg_level = timeline_df.groupby(["bucket", "level"]).size().reset_index(name="count")
-    agg_exception = timeline_df.groupby(["bucket", "exception"]).size().reset_index(name="count")
-
-    plot_pivot_time_series(agg_module, "module", "Exceptions by Module (timeline)", max_series=6)
-    plot_pivot_time_series(agg_level, "level", "Exceptions by Level (timeline)", max_series=6)
-    plot_pivot_time_series(agg_exception, "exception", "Exceptions by Exception Type (timeline)", max_series=12)
+# timelines: slices of the rollup cube; a text search, source facet or time window needs the matching rows themselves
+st.subheader("Timelines (module / level / exception / category)")
+row_filtered = bool(search_input or selected_sources or windowed)
+if row_filtered:
+    span = (filtered["timestamp"].min(), filtered["timestamp"].max()) if filtered["timestamp"].notna().any() else None
+else:
+    with stage("rollup", rows=len(df)):
+        cube = get_derived("rollup", lambda: RollupCube(df), lambda cube, new: cube.extend(new))
+    span = cube.span(selected_exceptions)
+if span is not None:
+    resolution = pick_resolution((span[1] - span[0]).total_seconds())
+    timeline_exceptions = selected_exceptions
+    if row_filtered:
+        with stage("rollup", rows=len(filtered)):
+            cube = RollupCube(filtered)
+        timeline_exceptions = None
+
+    for dimension, title, max_series in (
+        ("module", "Exceptions by Module (timeline)", 6),
+        ("level", "Exceptions by Level (timeline)", 6),
+        ("exception", "Exceptions by Exception Type (timeline)", 12),
+        ("category", "Exceptions by Category (timeline)", 8),
+        ("source", "Exceptions by Source (timeline)", 12),
+    ):
+        if dimension not in cube.dimensions:
+            continue
+        with stage(f"aggregate: {dimension}"):
+            agg = cube.counts(resolution, dimension, timeline_exceptions)
+        plot_pivot_time_series(agg, dimension, title, max_series=max_series)
 else:
     st.info("No timestamped entries available to build timelines for current filter.")
 
 st.markdown("---")
 
 # Table
-display_df = filtered[["timestamp_raw", "timestamp", "module", "level", "exception", "exc_message", "raw_traceback"]].copy()
-display_df = display_df.rename(columns={"timestamp_raw": "timestamp_text", "exc_message": "exception_message", "raw_traceback": "traceback"})
 st.subheader("Occurrences")
-show_table(display_df, enable_aggrid=enable_aggrid, show_traceback_default=show_traceback_default)
-
-# downloads
-download_df = filtered.copy()
-download_df["timestamp"] = download_df["timestamp"].apply(lambda x: x.isoformat() if pd.notnull(x) else "")
-export_df = download_df[["timestamp", "module", "level", "exception", "exc_message", "category", "raw_traceback"]].rename(columns={"exc_message": "exception_message", "raw_traceback": "traceback"})
-st.download_button("Download filtered results (CSV)", data=export_df.to_csv(index=False).encode("utf-8"), file_name="parsed_errors_filtered.csv", mime="text/csv")
-st.download_button("Download filtered results (JSON)", data=export_df.to_json(orient="records", date_format="iso").encode("utf-8"), file_name="parsed_errors_filtered.json", mime="application/json")
+table_view = st.radio("View", ["Every occurrence", "Grouped by traceback fingerprint"], horizontal=True)
+if table_view == "Every occurrence":
+    show_table(filtered, enable_aggrid=enable_aggrid, show_traceback_default=show_traceback_default, key="occurrences")
+else:
+    with stage("group occurrences", rows=len(filtered)):
+        groups = group_occurrences(filtered)
+    show_groups(groups, show_traceback_default=show_traceback_default)
+
+def export_download(data, rows, fmt):
+    # runs when a download button is clicked, so it is timed as a run of its own
+    with recorded_run(f"export {fmt}"):
+        return export_bytes(data.iloc[rows], fmt)
+
+
+# downloads: generated only when a button is clicked. The button holds the parsed log
+# (kept anyway) and the filtered row positions, not a filtered copy; Streamlit keeps the
+# generated file in memory as bytes until the session moves on
+for fmt, label in (("csv", "CSV"), ("json", "JSON"), ("parquet", "Parquet")):
+    if fmt == "parquet" and not PARQUET_AVAILABLE:
+        continue
+    st.download_button(f"Download filtered results ({label})", data=partial(export_download, df, filtered_rows, fmt), file_name=f"parsed_errors_filtered.{fmt}", mime=EXPORT_MIME[fmt])
+
+st.markdown("---")
+
+# SQL over every parsed occurrence (the filters above do not apply); the engine is built on first use
+st.subheader("SQL query")
+
+
+def load_saved_query():
+    st.session_state["sql_text"] = SAVED_QUERIES[st.session_state["sql_saved"]]
+
+
+saved_name = st.selectbox("Saved queries", list(SAVED_QUERIES), key="sql_saved", on_change=load_saved_query)
+st.session_state.setdefault("sql_text", SAVED_QUERIES[saved_name])
+with st.form("sql_form"):
+    sql_text = st.text_area("SQL (tables: occurrences, categories)", key="sql_text", height=180)
+    run_sql = st.form_submit_button("Run query")
+if run_sql and sql_text.strip():
+    sql = get_derived("sql", lambda: SqlEngine(df))
+    try:
+        sql_result = sql.query(sql_text)
+    except ValueError as exc:
+        st.error(f"{sql.engine}: {exc}")
+    else:
+        st.session_state["sql_result"] = (data_key, sql.engine, *sql_result)
+if st.session_state.get("sql_result", (None,))[0] == data_key:
+    _, sql_engine_name, sql_frame, sql_truncated = st.session_state["sql_result"]
+    st.caption(f"{len(sql_frame)} row(s) from {sql_engine_name}" + (" (first rows only)" if sql_truncated else ""))
+    st.dataframe(sql_frame, hide_index=True)
+
+# downloads run later, as runs of their own (see export_download)
+finish_run(run)
+with st.sidebar.expander("Stage timings"):
+    st.dataframe(run.rows(), hide_index=True)
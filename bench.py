@@ -0,0 +1,425 @@
+# bench.py
+"""
+Benchmarks for the parser and the stages the app runs on a parsed log: counting,
+filtering and search, timeline rollups, a time-range zoom, chart rendering, the table
+page, merging several logs, the SQL engine's saved queries and exports.
+Runs on a synthetic log from loggen.py (or --log FILE) and reports per stage the best
+wall time, throughput, peak traced memory and the memory blocks left allocated.
+
+    python bench.py --size 50MB --save baseline.json
+    python bench.py --size 50MB --compare baseline.json --tolerance 0.2
+    python bench.py --size 50MB --format json --cases parse_text,parse_buffer
+
+The `startup` case runs the app's landing page ("Upload a log file ...") in a fresh
+interpreter, as a newly started server would: its script time must stay within
+--startup-budget and it must not import any of LANDING_PAGE_EXCLUDED.
+
+The exit status is 1 if the startup check fails or, with --compare, if a stage got
+slower or uses more peak memory than the baseline allows; 0 otherwise.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import streamlit.logger
+
+# the charts are drawn outside a streamlit server; its "no runtime" warnings are expected
+streamlit.logger.set_log_level("error")
+
+import loggen  # noqa: E402
+from charts import _render_png, plot_pivot_time_series  # noqa: E402
+from exports import PARQUET_AVAILABLE, export_bytes  # noqa: E402
+from parser import PARSER_VERSION, extract_errors_from_buffer, extract_errors_from_log_text, group_occurrences, iter_log_frames, merge_sources, time_order_key, time_window  # noqa: E402
+from rollup import RollupCube, pick_resolution  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+from sql_engine import SAVED_QUERIES, SqlEngine  # noqa: E402
+from table_utils import DISPLAY_COLUMNS, expand_categoricals, table_positions  # noqa: E402
+
+EXIT_OK, EXIT_REGRESSION = 0, 1
+SEARCH_QUERIES = ("error", "request 1", "timeout", r"0x7f[0-9a-f]+")
+# the parsed log is dealt out round-robin to this many "workers" for the merge case
+MERGE_SOURCES = 8
+# the time_window case zooms into this much of the middle of the log
+WINDOW = pd.Timedelta(minutes=5)
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+STARTUP_BUDGET_SECONDS = 1.0
+# modules the landing page must not load (they are only needed once a log is open)
+LANDING_PAGE_EXCLUDED = ("pandas", "numpy", "matplotlib", "pyarrow", "st_aggrid", "dateutil", "duckdb")
+# runs in a fresh interpreter: one script run of the app without an upload, as JSON
+_STARTUP_PROBE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+before = set(sys.modules)
+start = time.perf_counter()
+AppTest.from_file(sys.argv[1], default_timeout=120).run()
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "modules": sorted(set(sys.modules) - before)}))
+"""
+
+# a case gets the shared context and returns the function to time; that function
+# returns the number of rows it processed
+Case = Callable[[Dict], Callable[[], int]]
+
+
+def _parse_text(ctx: Dict) -> Callable[[], int]:
+    with open(ctx["path"], encoding="utf-8", errors="replace") as fh:
+        text = fh.read()
+    return lambda: len(extract_errors_from_log_text(text))
+
+
+def _parse_buffer(ctx: Dict) -> Callable[[], int]:
+    return lambda: len(extract_errors_from_buffer(ctx["path"]))
+
+
+def _parse_stream(ctx: Dict) -> Callable[[], int]:
+    return lambda: sum(len(frame) for frame in iter_log_frames(ctx["path"]))
+
+
+def _counts(ctx: Dict) -> Callable[[], int]:
+    df = ctx["df"]
+
+    def run():
+        # the category buttons and sub-error lists of app.py
+        df["category_key"].value_counts()
+        df.groupby("category_key", observed=True)["exception"].value_counts().loc[lambda c: c > 0]
+        return len(df)
+    return run
+
+
+def _filter(ctx: Dict) -> Callable[[], int]:
+    df = ctx["df"]
+    top = df["category_key"].value_counts().index[0]
+    exceptions = list(df.loc[df["category_key"] == top, "exception"].unique())
+
+    def run():
+        return int(df["exception"].isin(exceptions).to_numpy().sum())
+    return run
+
+
+def _search(ctx: Dict) -> Callable[[], int]:
+    df = ctx["df"]
+
+    def run():
+        # a fresh index each time: building it is part of the first search of a log
+        index = SearchIndex(df)
+        for q in SEARCH_QUERIES:
+            index.mask(q)
+        return len(df)
+    return run
+
+
+def _rollup(ctx: Dict) -> Callable[[], int]:
+    df = ctx["df"]
+
+    def run():
+        cube = RollupCube(df)
+        first, last = cube.span()
+        resolution = pick_resolution((last - first).total_seconds())
+        for dimension in cube.dimensions:
+            cube.counts(resolution, dimension)
+        return len(df)
+    return run
+
+
+def _charts(ctx: Dict) -> Callable[[], int]:
+    cube = RollupCube(ctx["df"])
+    first, last = cube.span()
+    resolution = pick_resolution((last - first).total_seconds())
+    aggs = [(dim, cube.counts(resolution, dim)) for dim in cube.dimensions]
+
+    def run():
+        # drop cached images so every run draws
+        _render_png.clear()
+        for dimension, agg in aggs:
+            plot_pivot_time_series(agg, dimension, dimension)
+        return sum(len(agg) for _, agg in aggs)
+    return run
+
+
+def _time_window(ctx: Dict) -> Callable[[], int]:
+    df = ctx["df"]
+    keys = time_order_key(df["timestamp"])
+    middle = df["timestamp"].min() + (df["timestamp"].max() - df["timestamp"].min()) / 2
+
+    def run():
+        # what app.py redoes for a time range: slice, counts and the window's timelines
+        window = df.iloc[time_window(keys, middle, middle + WINDOW)]
+        window["category_key"].value_counts()
+        cube = RollupCube(window)
+        for dimension in cube.dimensions:
+            cube.counts("minute", dimension)
+        return len(window)
+    return run
+
+
+def _table_page(ctx: Dict) -> Callable[[], int]:
+    df = ctx["df"]
+    columns = [c for c in DISPLAY_COLUMNS if c in df.columns]
+
+    def run():
+        positions = table_positions(df, "timestamp", False, "message", "request")
+        page = df.iloc[positions[:50]][columns].rename(columns=DISPLAY_COLUMNS).reset_index(drop=True)
+        expand_categoricals(page).to_json(orient="records")
+        return len(positions)
+    return run
+
+
+def _groups(ctx: Dict) -> Callable[[], int]:
+    df = ctx["df"]
+    return lambda: len(group_occurrences(df))
+
+
+def _merge(ctx: Dict) -> Callable[[], int]:
+    df = ctx["df"]
+    parts = [df.iloc[i::MERGE_SOURCES].reset_index(drop=True) for i in range(MERGE_SOURCES)]
+    names = [f"worker-{i}.log" for i in range(MERGE_SOURCES)]
+    return lambda: len(merge_sources(parts, names))
+
+
+def _sql(ctx: Dict) -> Callable[[], int]:
+    df = ctx["df"]
+
+    def run():
+        # a fresh engine each time: registering the log is part of its first query
+        engine = SqlEngine(df)
+        for sql in SAVED_QUERIES.values():
+            engine.query(sql)
+        return len(df)
+    return run
+
+
+def _export(fmt: str) -> Case:
+    def case(ctx: Dict) -> Callable[[], int]:
+        df = ctx["df"]
+
+        def run():
+            export_bytes(df, fmt)
+            return len(df)
+        return run
+    return case
+
+
+CASES: Dict[str, Case] = {
+    "parse_text": _parse_text,
+    "parse_buffer": _parse_buffer,
+    "parse_stream": _parse_stream,
+    "counts": _counts,
+    "filter": _filter,
+    "search": _search,
+    "rollup": _rollup,
+    "time_window": _time_window,
+    "charts": _charts,
+    "table_page": _table_page,
+    "groups": _groups,
+    "merge": _merge,
+    "sql": _sql,
+    "export_csv": _export("csv"),
+    "export_json": _export("json"),
+}
+if PARQUET_AVAILABLE:
+    CASES["export_parquet"] = _export("parquet")
+# cases whose throughput is also reported per input byte
+PARSE_CASES = ("parse_text", "parse_buffer", "parse_stream")
+STARTUP_CASE = "startup"
+ALL_CASES = list(CASES) + [STARTUP_CASE]
+
+
+def measure(run: Callable[[], int], repeat: int) -> Dict:
+    """Best and median wall time over `repeat` runs, then one traced run for memory."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        rows = run()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    gc.collect()
+    return {
+        "seconds": min(times),
+        "median_seconds": statistics.median(times),
+        "rows": rows,
+        "peak_mb": peak / 2**20,
+        # blocks still allocated after the run (caches, leaks), not a count of all allocations
+        "retained_blocks": sys.getallocatedblocks() - blocks,
+    }
+
+
+def measure_startup(repeat: int, app_path: str = APP_PATH) -> Dict:
+    """Landing page script time in fresh interpreters (best and median), and what it imported."""
+    times, process_times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", _STARTUP_PROBE, app_path], capture_output=True, text=True, check=True)
+        process_times.append(time.perf_counter() - start)
+        probe = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(probe["seconds"])
+    loaded = {m.split(".")[0] for m in probe["modules"]}
+    return {
+        "seconds": min(times),
+        "median_seconds": statistics.median(times),
+        "rows": 0,
+        "peak_mb": None,
+        "retained_blocks": None,
+        # interpreter and streamlit start-up included
+        "process_seconds": min(process_times),
+        "excluded_modules_loaded": sorted(loaded.intersection(LANDING_PAGE_EXCLUDED)),
+    }
+
+
+def check_startup(stats: Dict, budget: float) -> List[str]:
+    problems = []
+    if stats["seconds"] > budget:
+        problems.append(f"landing page took {stats['seconds']:.3f}s (budget {budget:.3f}s)")
+    if stats["excluded_modules_loaded"]:
+        problems.append(f"landing page imported {', '.join(stats['excluded_modules_loaded'])}")
+    return problems
+
+
+def run_cases(path: str, names: List[str], repeat: int) -> Dict[str, Dict]:
+    ctx = {"path": path, "input_bytes": os.path.getsize(path)}
+    if any(name in CASES for name in names):
+        ctx["df"] = extract_errors_from_buffer(path)
+    results = {}
+    for name in names:
+        if name == STARTUP_CASE:
+            stats = measure_startup(repeat)
+        else:
+            stats = measure(CASES[name](ctx), repeat)
+        stats["rows_per_s"] = stats["rows"] / stats["seconds"] if stats["seconds"] else None
+        if name in PARSE_CASES:
+            stats["mb_per_s"] = ctx["input_bytes"] / 2**20 / stats["seconds"] if stats["seconds"] else None
+        results[name] = stats
+        print(f"  {name}: {stats['seconds']:.3f}s", file=sys.stderr)
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float, min_seconds: float = 0.005) -> Dict[str, List[str]]:
+    """Regressions per case: slower, or higher peak memory, by more than `tolerance` (a fraction)."""
+    regressions: Dict[str, List[str]] = {}
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        reasons = []
+        # very short stages are all noise
+        if stats["seconds"] > base["seconds"] * (1 + tolerance) and stats["seconds"] - base["seconds"] > min_seconds:
+            reasons.append(f"time {base['seconds']:.3f}s -> {stats['seconds']:.3f}s")
+        if stats["peak_mb"] is not None and base.get("peak_mb") is not None and stats["peak_mb"] > base["peak_mb"] * (1 + tolerance) and stats["peak_mb"] - base["peak_mb"] > 1:
+            reasons.append(f"peak memory {base['peak_mb']:.1f}MB -> {stats['peak_mb']:.1f}MB")
+        if reasons:
+            regressions[name] = reasons
+    return regressions
+
+
+def format_table(results: Dict[str, Dict], baseline: Optional[Dict[str, Dict]] = None) -> str:
+    rows = []
+    for name, s in results.items():
+        row = {
+            "case": name,
+            "seconds": f"{s['seconds']:.3f}",
+            "rows/s": f"{s['rows_per_s']:,.0f}" if s["rows_per_s"] else "",
+            "MB/s": f"{s['mb_per_s']:.1f}" if s.get("mb_per_s") else "",
+            "peak MB": f"{s['peak_mb']:.1f}" if s["peak_mb"] is not None else "",
+            "retained blocks": str(s["retained_blocks"]) if s["retained_blocks"] is not None else "",
+        }
+        if baseline is not None:
+            base = baseline.get(name)
+            row["vs baseline"] = f"{s['seconds'] / base['seconds']:.2f}x" if base and base["seconds"] else "new"
+        rows.append(row)
+    return pd.DataFrame(rows).to_string(index=False)
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Benchmark the parser and the app's pipeline stages.")
+    ap.add_argument("--log", help="log file to benchmark (default: a generated one)")
+    ap.add_argument("--size", default="20MB", help="size of the generated log")
+    ap.add_argument("--seed", type=int, default=0, help="seed of the generated log")
+    ap.add_argument("--format", choices=loggen.FORMATS, default="python", help="entry layout of the generated log")
+    ap.add_argument("--cases", help=f"comma-separated subset of: {','.join(ALL_CASES)}")
+    ap.add_argument("--repeat", type=int, default=3, help="timed runs per case (the best counts)")
+    ap.add_argument("--save", metavar="FILE", help="write the results as a baseline")
+    ap.add_argument("--compare", metavar="FILE", help="report regressions against this baseline")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown / memory growth as a fraction")
+    ap.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET_SECONDS, metavar="SECONDS", help="allowed landing page script time")
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    names = args.cases.split(",") if args.cases else ALL_CASES
+    unknown = [n for n in names if n not in ALL_CASES]
+    if unknown:
+        print(f"unknown case(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    meta = {
+        "parser_version": PARSER_VERSION,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.log:
+            path = args.log
+            meta["input"] = {"log": os.path.abspath(path)}
+        elif not any(name in CASES for name in names):
+            # the startup case needs no log
+            path = os.devnull
+            meta["input"] = {}
+        else:
+            path = os.path.join(tmp, "bench.log")
+            print(f"generating {args.size} {args.format} log (seed {args.seed})", file=sys.stderr)
+            loggen.generate_file(path, loggen.parse_size(args.size), args.seed, fmt=args.format)
+            meta["input"] = {"size": args.size, "seed": args.seed}
+            if args.format != "python":
+                # (baselines saved before --format existed stay comparable)
+                meta["input"]["format"] = args.format
+        meta["input"]["bytes"] = os.path.getsize(path)
+        results = run_cases(path, names, args.repeat)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            saved = json.load(fh)
+        if saved["meta"].get("input") != meta["input"]:
+            print(f"warning: baseline input {saved['meta'].get('input')} differs from {meta['input']}", file=sys.stderr)
+        baseline = saved["results"]
+    print(format_table(results, baseline))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as fh:
+            json.dump({"meta": meta, "results": results}, fh, indent=2)
+            fh.write("\n")
+
+    regressions = compare(results, baseline, args.tolerance) if baseline is not None else {}
+    if STARTUP_CASE in results:
+        problems = check_startup(results[STARTUP_CASE], args.startup_budget)
+        if problems:
+            regressions.setdefault(STARTUP_CASE, []).extend(problems)
+    for name, reasons in regressions.items():
+        print(f"regression: {name}: {'; '.join(reasons)}", file=sys.stderr)
+    return EXIT_REGRESSION if regressions else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
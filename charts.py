@@ -2,42 +2,114 @@
 """
 Matplotlib chart helpers used by the Streamlit UI.
 Provides functions to plot pivoted time-series: module / level / exception.
+Series are downsampled to the figure's pixel width (LTTB) and rendered once to PNG;
+the image is cached by a hash of the aggregate and the chart options, so reruns with the
+same data do not draw again.
 """
 
-import matplotlib.pyplot as plt
-import streamlit as st
+import hashlib
+import io
+from typing import Optional
+
+import numpy as np
 import pandas as pd
+import streamlit as st
+
+from instrument import stage
 
+FIG_WIDTH_IN = 10
+FIG_DPI = 100
+# markers only help while points are far apart
+MAX_MARKED_POINTS = 200
 
-def plot_pivot_time_series(agg_df: pd.DataFrame, group_name: str, title: str, max_series: int = 8):
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
     """
-    agg_df: DataFrame with columns ['bucket', group_name, 'count']
-    group_name: e.g. 'module', 'level', 'exception'
+    Largest-Triangle-Three-Buckets: indices of `n_out` points of (x, y) that keep the
+    visual shape of the series. First and last points are always kept.
     """
-    if agg_df.empty:
-        st.info(f"No data for {title}.")
-        return
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        # area of the triangle (selected point, candidate, average of the next bucket)
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def _frame_digest(df: pd.DataFrame) -> str:
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.blake2b(row_hashes.tobytes(), digest_size=16).hexdigest()
 
-    pivot = agg_df.pivot(index="bucket", columns=group_name, values="count").fillna(0)
-    if pivot.empty:
-        st.info(f"No data for {title}.")
-        return
 
-    # limit series
-    if pivot.shape[1] > max_series:
-        total_counts = pivot.sum().sort_values(ascending=False)
-        top_cols = total_counts.index[:max_series].tolist()
-        pivot_plot = pivot[top_cols]
+@st.cache_data(max_entries=64, show_spinner=False)
+def _render_png(digest: str, _agg_df: pd.DataFrame, group_name: str, title: str, max_series: int, max_points: int) -> Optional[bytes]:
+    # `digest` identifies _agg_df (underscore: not hashed by streamlit itself)
+    with stage("render chart", rows=len(_agg_df)):
+        return _draw_png(_agg_df, group_name, title, max_series, max_points)
+
+
+def _draw_png(agg_df: pd.DataFrame, group_name: str, title: str, max_series: int, max_points: int) -> Optional[bytes]:
+    # matplotlib takes a while to import; only pages that draw a chart pay for it
+    from matplotlib.figure import Figure
+
+    # keep the top series by total count before pivoting, so only those are reshaped
+    totals = agg_df.groupby(group_name, observed=True)["count"].sum()
+    if len(totals) > max_series:
+        top_cols = totals.sort_values(ascending=False, kind="stable").index[:max_series]
+        agg_df = agg_df[agg_df[group_name].isin(top_cols)]
     else:
-        pivot_plot = pivot
+        top_cols = totals.index
+
+    pivot_plot = agg_df.pivot(index="bucket", columns=group_name, values="count").fillna(0)
+    if pivot_plot.empty:
+        return None
+    pivot_plot = pivot_plot.reindex(columns=[c for c in top_cols if c in pivot_plot.columns])
 
-    fig, ax = plt.subplots(figsize=(10, 3.0 + 0.4 * min(8, pivot_plot.shape[1])))
+    # a Figure not created through pyplot is not tracked globally and is freed with its last reference
+    fig = Figure(figsize=(FIG_WIDTH_IN, 3.0 + 0.4 * min(8, pivot_plot.shape[1])), dpi=FIG_DPI)
+    ax = fig.subplots()
+    times = pivot_plot.index.to_numpy()
+    x = times.astype("datetime64[ns]").astype(np.int64).astype(float)
     for colname in pivot_plot.columns:
-        ax.plot(pivot_plot.index, pivot_plot[colname], marker="o", label=str(colname))
+        y = pivot_plot[colname].to_numpy(dtype=float)
+        keep = lttb_indices(x, y, max_points)
+        marker = "o" if len(keep) <= MAX_MARKED_POINTS else None
+        ax.plot(times[keep], y[keep], marker=marker, label=str(colname))
     ax.set_xlabel("Time")
     ax.set_ylabel("Count")
     ax.set_title(title)
     ax.legend(loc="upper right", fontsize="small", ncol=1)
     ax.grid(True)
     fig.autofmt_xdate()
-    st.pyplot(fig)
+    out = io.BytesIO()
+    fig.savefig(out, format="png")
+    return out.getvalue()
+
+
+def plot_pivot_time_series(agg_df: pd.DataFrame, group_name: str, title: str, max_series: int = 8, max_points: Optional[int] = None):
+    """
+    agg_df: DataFrame with columns ['bucket', group_name, 'count']
+    group_name: e.g. 'module', 'level', 'exception'
+    max_points: points drawn per series (default: the figure's width in pixels)
+    """
+    if agg_df.empty:
+        st.info(f"No data for {title}.")
+        return
+
+    with stage(f"chart: {group_name}", rows=len(agg_df)):
+        png = _render_png(_frame_digest(agg_df), agg_df, group_name, title, max_series, max_points or FIG_WIDTH_IN * FIG_DPI)
+        if png is None:
+            st.info(f"No data for {title}.")
+            return
+        st.image(png, width="stretch")
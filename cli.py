@@ -0,0 +1,260 @@
+# cli.py
+"""
+Headless batch analyser: parse log files without the Streamlit UI and write category,
+sub-error and timeline summaries per file and combined.
+
+    python cli.py /var/log/app/ 'archive/*.log.*' --workers 8 --format csv --output out/
+    python cli.py app.log --alert-on Type_5_Network --alert-threshold 100
+
+Files are spread over a process pool and each one is streamed through the parser in
+chunks, so memory use does not grow with file size. Only entries with an exception (or a
+category) are counted. Exit status: 0 ok, 1 an alert condition matched in the files that
+could be read (even if others could not), 2 some input could not be read and no alert
+matched, or the run failed.
+"""
+
+import argparse
+import fnmatch
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from errors_mapping import CATEGORY_MAPPING
+from ingest import READ_ERRORS
+from parser import detect_source_profile, iter_log_frames
+from profiles import PROFILES
+from rollup import RESOLUTIONS
+
+EXIT_OK, EXIT_ALERT, EXIT_ERROR = 0, 1, 2
+DEFAULT_INCLUDE = ("*.log", "*.log.*", "*.txt")
+COMBINED = "(all)"
+
+
+def expand_inputs(inputs: Iterable[str], include: Iterable[str] = DEFAULT_INCLUDE) -> List[str]:
+    """Files named by paths, globs or directories (searched recursively for `include` names)."""
+    include = tuple(include)
+    found = []
+    for item in inputs:
+        matches = sorted(glob.glob(item, recursive=True)) if glob.has_magic(item) else [item]
+        for path in matches:
+            if os.path.isdir(path):
+                for root, dirs, files in os.walk(path):
+                    dirs.sort()
+                    found.extend(os.path.join(root, f) for f in sorted(files) if any(fnmatch.fnmatch(f, p) for p in include))
+            else:
+                found.append(path)
+    # keep the first occurrence of each file
+    return list(dict.fromkeys(found))
+
+
+def _empty_counts(*names: str) -> pd.Series:
+    return pd.Series([], index=pd.MultiIndex.from_arrays([[]] * len(names), names=list(names)), dtype="int64")
+
+
+def _merge_counts(a: Optional[pd.Series], b: pd.Series) -> pd.Series:
+    """Sum two count series indexed by the same levels (missing keys kept)."""
+    if a is None or a.empty:
+        return b.astype("int64")
+    merged = pd.concat([a, b])
+    return merged.groupby(level=list(range(merged.index.nlevels)), dropna=False).sum().astype("int64")
+
+
+def summarize_file(path: str, resolution: str = "hour", chunk_size: int = 100_000, profile: Optional[str] = None) -> Dict:
+    """
+    Counts for one file: {"path", "profile", "profile_clear", "occurrences", "subs", "timeline",
+    "error"}. Only entries with an exception or a category key count: `occurrences` is the
+    sum of `subs`, which is indexed by (category_key, exception), `timeline` by (bucket, exception).
+    profile: name of a log-format profile (see profiles.py); None detects it per file, and
+    `profile_clear` is False when that detection was a close vote.
+    """
+    subs = timeline = None
+    occurrences = 0
+    chosen, clear = PROFILES.get(profile), True
+    try:
+        if chosen is None:
+            chosen, clear = detect_source_profile(path)
+        for frame in iter_log_frames(path, chunk_size=chunk_size, profile=chosen):
+            frame = frame[frame["exception"].notna() | frame["category_key"].notna()]
+            occurrences += len(frame)
+            frame = frame.astype({"category_key": object, "exception": object})
+            subs = _merge_counts(subs, frame.groupby(["category_key", "exception"], dropna=False).size())
+            timed = frame[frame["timestamp"].notna()]
+            bucket = timed["timestamp"].dt.floor(RESOLUTIONS[resolution]).rename("bucket")
+            timeline = _merge_counts(timeline, timed.groupby([bucket, timed["exception"]], dropna=False).size())
+    except READ_ERRORS as exc:
+        # one unreadable file is reported as that file's error, the others still count
+        return {"path": path, "profile": None, "profile_clear": True, "occurrences": 0, "subs": None, "timeline": None,
+                "error": f"{type(exc).__name__}: {exc}"}
+    if subs is None:
+        subs = _empty_counts("category_key", "exception")
+    if timeline is None:
+        timeline = _empty_counts("bucket", "exception")
+    return {"path": path, "profile": chosen.name, "profile_clear": clear, "occurrences": occurrences, "subs": subs,
+            "timeline": timeline, "error": None}
+
+
+def _tables(summaries: List[Dict]) -> Dict[str, pd.DataFrame]:
+    """Long-format tables over all summaries, plus COMBINED rows summed over files."""
+    parts = {"categories": [], "suberrors": [], "timeline": []}
+    ok = [s for s in summaries if s["error"] is None]
+    combined_subs = _empty_counts("category_key", "exception")
+    combined_timeline = _empty_counts("bucket", "exception")
+    for s in ok:
+        if not s["subs"].empty:
+            combined_subs = _merge_counts(combined_subs, s["subs"])
+        if not s["timeline"].empty:
+            combined_timeline = _merge_counts(combined_timeline, s["timeline"])
+    named = [(s["path"], s["subs"], s["timeline"]) for s in ok]
+    if len(ok) != 1:
+        named.append((COMBINED, combined_subs, combined_timeline))
+    for source, subs, timeline in named:
+        subs = subs.rename("count").reset_index()
+        subs.insert(0, "source", source)
+        cats = subs.groupby(["source", "category_key"], dropna=False)["count"].sum().reset_index()
+        cats.insert(2, "category", cats["category_key"].map(lambda k: CATEGORY_MAPPING.get(k, {}).get("category")))
+        timeline = timeline.rename("count").reset_index()
+        timeline.insert(0, "source", source)
+        parts["categories"].append(cats)
+        parts["suberrors"].append(subs)
+        parts["timeline"].append(timeline)
+    columns = {
+        "categories": ["source", "category_key", "category", "count"],
+        "suberrors": ["source", "category_key", "exception", "count"],
+        "timeline": ["source", "bucket", "exception", "count"],
+    }
+    tables = {}
+    for name, frames in parts.items():
+        frames = [f for f in frames if not f.empty]
+        tables[name] = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns[name])
+    return tables
+
+
+def _to_json(summaries: List[Dict], tables: Dict[str, pd.DataFrame]) -> Dict:
+    out = {"files": {}, "errors": {s["path"]: s["error"] for s in summaries if s["error"]}}
+    for s in summaries:
+        if s["error"] is None:
+            out["files"][s["path"]] = {"profile": s["profile"], "occurrences": s["occurrences"]}
+    out["combined"] = {"occurrences": sum(s["occurrences"] for s in summaries)}
+    for name, table in tables.items():
+        table = table.astype({"bucket": str}) if "bucket" in table.columns else table
+        records = table.astype(object).where(table.notna(), None).to_dict(orient="records")
+        for rec in records:
+            source = rec.pop("source")
+            target = out["combined"] if source == COMBINED else out["files"].get(source)
+            if target is not None:
+                target.setdefault(name, []).append(rec)
+    if len(out["files"]) == 1:
+        # a single file is its own combined summary
+        only = next(iter(out["files"].values()))
+        out["combined"] = dict(only)
+    return out
+
+
+def write_outputs(summaries: List[Dict], fmt: str, output: Optional[str]) -> None:
+    tables = _tables(summaries)
+    if fmt == "json":
+        text = json.dumps(_to_json(summaries, tables), indent=2, default=str)
+        if output in (None, "-"):
+            sys.stdout.write(text + "\n")
+        else:
+            os.makedirs(output, exist_ok=True)
+            with open(os.path.join(output, "summary.json"), "w", encoding="utf-8") as fh:
+                fh.write(text + "\n")
+        return
+    if output in (None, "-"):
+        raise ValueError(f"--format {fmt} writes one file per table and needs --output DIR")
+    os.makedirs(output, exist_ok=True)
+    for name, table in tables.items():
+        target = os.path.join(output, f"{name}.{fmt}")
+        if fmt == "csv":
+            table.to_csv(target, index=False)
+        else:
+            table.to_parquet(target, index=False)
+
+
+def alert_reasons(summaries: List[Dict], alert_on: Iterable[str], threshold: Optional[int]) -> List[str]:
+    """Alert conditions met by the combined counts (names are exceptions or category keys)."""
+    reasons = []
+    total = sum(s["occurrences"] for s in summaries)
+    if threshold is not None and total >= threshold:
+        reasons.append(f"{total} occurrences (threshold {threshold})")
+    counts: Dict[str, int] = {}
+    for s in summaries:
+        if s["subs"] is None:
+            continue
+        for (cat_key, exc), n in s["subs"].items():
+            for name in (cat_key, exc):
+                if isinstance(name, str):
+                    counts[name] = counts.get(name, 0) + int(n)
+    for name in alert_on:
+        if counts.get(name):
+            reasons.append(f"{counts[name]} x {name}")
+    return reasons
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Summarise exceptions in log files without the web UI.")
+    ap.add_argument("inputs", nargs="+", help="log files, globs or directories")
+    ap.add_argument("--include", action="append", help=f"file name pattern searched in directories (default: {' '.join(DEFAULT_INCLUDE)})")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="files parsed in parallel")
+    ap.add_argument("--resolution", choices=list(RESOLUTIONS), default="hour", help="timeline bucket size")
+    ap.add_argument("--format", choices=("json", "csv", "parquet"), default="json")
+    ap.add_argument("--output", help="output directory (json goes to stdout without it)")
+    ap.add_argument("--chunk-size", type=int, default=100_000, help="rows parsed per streamed chunk")
+    ap.add_argument("--log-format", choices=list(PROFILES), help="format of the input logs (default: detected per file)")
+    ap.add_argument("--alert-on", action="append", default=[], metavar="NAME", help="exit 1 if this exception or category key occurs")
+    ap.add_argument("--alert-threshold", type=int, metavar="N", help="exit 1 if there are at least N occurrences in total")
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    try:
+        return run(args)
+    except Exception as exc:
+        # exit status 1 means an alert matched; a crash must never look like one
+        print(f"error: {type(exc).__name__}: {exc}", file=sys.stderr)
+        return EXIT_ERROR
+
+
+def run(args: argparse.Namespace) -> int:
+    paths = expand_inputs(args.inputs, args.include or DEFAULT_INCLUDE)
+    if not paths:
+        print("no input files found", file=sys.stderr)
+        return EXIT_ERROR
+
+    tasks = [(p, args.resolution, args.chunk_size, args.log_format) for p in paths]
+    if args.workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(paths))) as pool:
+            summaries = list(pool.map(summarize_file, *zip(*tasks)))
+    else:
+        summaries = [summarize_file(*t) for t in tasks]
+
+    try:
+        write_outputs(summaries, args.format, args.output)
+    except (OSError, ValueError, ImportError) as exc:
+        print(f"cannot write output: {exc}", file=sys.stderr)
+        return EXIT_ERROR
+
+    for s in summaries:
+        if s["error"]:
+            print(f"error: {s['path']}: {s['error']}", file=sys.stderr)
+        elif not s["profile_clear"]:
+            print(f"warning: {s['path']}: log format unclear (mixed lines), read as {s['profile']}; "
+                  "set --log-format if the counts look wrong", file=sys.stderr)
+    reasons = alert_reasons(summaries, args.alert_on, args.alert_threshold)
+    for reason in reasons:
+        print(f"alert: {reason}", file=sys.stderr)
+    # a matched alert wins over unreadable files, so a job waiting for exit 1 still sees it
+    if reasons:
+        return EXIT_ALERT
+    return EXIT_ERROR if any(s["error"] for s in summaries) else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,9 +2,21 @@
 """
 Contains CATEGORY_MAPPING and helper functions to flatten / query the mapping.
 This file holds the full list of categories and sub-errors.
+`ExceptionClassifier` maps exception names as logged (qualified, subclassed, ...) to
+category keys; `CLASSIFIER` is the instance the parser uses.
 """
 
-from typing import Dict, List
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
 
 CATEGORY_MAPPING: Dict[str, Dict] = {
     "Type_1_Syntax": {
@@ -178,3 +190,94 @@ def get_all_suberrors() -> List[str]:
 def find_category_for_suberror(sub: str):
     """Return category key if sub exists, else None."""
     return SUB_TO_CAT.get(sub)
+
+
+class ExceptionClassifier:
+    """
+    Maps an exception name to a category key. Tried in order:
+      1. user rules: (glob pattern on the full name, category key), first match wins;
+      2. the name as listed in the mapping;
+      3. shorter qualified names: "mypkg.errors.TimeoutError" -> "errors.TimeoutError"
+         -> "TimeoutError" (so "builtins.KeyError" finds "KeyError");
+      4. a listed class name the name ends with at a CamelCase boundary:
+         "ReadTimeoutError" -> "TimeoutError" (generic bases like "Exception" excluded).
+    The last `max_memo` distinct names looked up are memoized (under a lock: the instance is
+    shared by the app's session threads); `classify_series` classifies the distinct values
+    of a column once and broadcasts them to rows.
+    """
+
+    GENERIC = frozenset({"Exception", "BaseException", "Error", "Warning"})
+
+    def __init__(
+        self,
+        mapping: Dict[str, Dict] = CATEGORY_MAPPING,
+        rules: Sequence[Tuple[str, str]] = (),
+        max_memo: int = 65_536,
+    ):
+        for pattern, cat_key in rules:
+            if cat_key not in mapping:
+                raise ValueError(f"rule {pattern!r}: unknown category key {cat_key!r}")
+        self.rules = [(re.compile(fnmatch.translate(pattern)), cat_key) for pattern, cat_key in rules]
+        self.exact: Dict[str, str] = {}
+        for cat_key, cat_obj in mapping.items():
+            for sub in cat_obj["errors"]:
+                self.exact.setdefault(sub, cat_key)
+        # identifies the rules, for cache keys of classified output
+        self.signature = hashlib.blake2b(json.dumps(list(rules)).encode(), digest_size=4).hexdigest() if rules else ""
+        self.max_memo = max_memo
+        self._memo: "OrderedDict[Optional[str], Optional[str]]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+    def _lookup(self, name: str) -> Optional[str]:
+        for rule, cat_key in self.rules:
+            if rule.match(name):
+                return cat_key
+        parts = name.split(".")
+        for i in range(len(parts)):
+            cat_key = self.exact.get(".".join(parts[i:]))
+            if cat_key:
+                return cat_key
+        short = parts[-1]
+        for i in range(1, len(short)):
+            if short[i].isupper():
+                suffix = short[i:]
+                if suffix in self.exact and suffix not in self.GENERIC:
+                    return self.exact[suffix]
+        return None
+
+    def classify(self, name: Optional[str]) -> Optional[str]:
+        """Category key for an exception name, or None."""
+        with self._memo_lock:
+            if name in self._memo:
+                self._memo.move_to_end(name)
+                return self._memo[name]
+        cat_key = self._lookup(name.strip()) if isinstance(name, str) and name.strip() else None
+        with self._memo_lock:
+            self._memo[name] = cat_key
+            while len(self._memo) > self.max_memo:
+                self._memo.popitem(last=False)
+        return cat_key
+
+    def classify_series(self, names: pd.Series) -> pd.Series:
+        """classify() over a column: each distinct name is looked up once."""
+        codes, uniques = pd.factorize(names)
+        keys = np.array([self.classify(n) for n in uniques] + [None], dtype=object)
+        # code -1 (missing) reads the trailing None
+        return pd.Series(keys[codes], index=names.index, dtype=object)
+
+
+def load_rules(path: Optional[str]) -> List[Tuple[str, str]]:
+    """
+    Rules for ExceptionClassifier from a JSON file: an object {"glob pattern": "category key"}
+    (kept in file order) or a list of [pattern, key] pairs. No path, no rules.
+    """
+    if not path:
+        return []
+    with open(path, encoding="utf-8") as fh:
+        data = json.load(fh)
+    items = data.items() if isinstance(data, dict) else data
+    return [(str(pattern), str(cat_key)) for pattern, cat_key in items]
+
+
+# LOG_ANALYSER_CATEGORY_RULES names a rules file (see load_rules)
+CLASSIFIER = ExceptionClassifier(rules=load_rules(os.environ.get("LOG_ANALYSER_CATEGORY_RULES")))
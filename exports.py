@@ -0,0 +1,109 @@
+# exports.py
+"""
+Exports of parsed rows (CSV, JSON, Parquet).
+Rows are converted a chunk at a time, so only one chunk's text exists next to the frame
+and the output. The output itself is built in memory: st.download_button serves its
+data as bytes, so there is nothing to gain from writing it to a file first.
+"""
+
+import io
+from typing import IO, Iterator
+
+import numpy as np
+import pandas as pd
+
+from instrument import stage
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except Exception:
+    PARQUET_AVAILABLE = False
+
+# parser column -> exported column
+EXPORT_COLUMNS = {
+    "timestamp": "timestamp",
+    "source": "source",
+    "module": "module",
+    "level": "level",
+    "exception": "exception",
+    "exc_message": "exception_message",
+    "category": "category",
+    "raw_traceback": "traceback",
+}
+EXPORT_MIME = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def iso_timestamps(ts: pd.Series) -> pd.Series:
+    """Same strings as ts.apply(lambda x: x.isoformat() if pd.notnull(x) else ""), vectorized."""
+    values = ts.to_numpy(dtype="datetime64[ns]")
+    out = np.datetime_as_string(values, unit="us").astype(object)
+    ints = values.view(np.int64)
+    # isoformat() drops a zero fraction and shows nanoseconds only when there are some
+    whole = ints % 1_000_000_000 == 0
+    out[whole] = np.datetime_as_string(values[whole], unit="s")
+    nanos = ints % 1000 != 0
+    out[nanos] = [pd.Timestamp(v).isoformat() for v in values[nanos]]
+    out[np.isnat(values)] = ""
+    return pd.Series(out, index=ts.index, dtype=object)
+
+
+def _chunks(df: pd.DataFrame, chunk_rows: int, iso: bool = True) -> Iterator[pd.DataFrame]:
+    columns = [c for c in EXPORT_COLUMNS if c in df.columns]
+    for start in range(0, max(len(df), 1), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows][columns].rename(columns=EXPORT_COLUMNS)
+        if iso and "timestamp" in chunk.columns:
+            chunk["timestamp"] = iso_timestamps(chunk["timestamp"])
+        yield chunk
+
+
+def write_csv(df: pd.DataFrame, fh: IO[bytes], chunk_rows: int = 100_000) -> None:
+    for i, chunk in enumerate(_chunks(df, chunk_rows)):
+        fh.write(chunk.to_csv(index=False, header=i == 0).encode("utf-8"))
+
+
+def write_json(df: pd.DataFrame, fh: IO[bytes], chunk_rows: int = 100_000) -> None:
+    """A JSON array of records, as DataFrame.to_json(orient="records") writes it."""
+    fh.write(b"[")
+    first = True
+    for chunk in _chunks(df, chunk_rows):
+        records = chunk.to_json(orient="records", date_format="iso")[1:-1]
+        if records:
+            fh.write(records.encode("utf-8") if first else b"," + records.encode("utf-8"))
+            first = False
+    fh.write(b"]")
+
+
+def write_parquet(df: pd.DataFrame, fh: IO[bytes], chunk_rows: int = 100_000) -> None:
+    """One row group per chunk; timestamps stay typed, categoricals become dictionary columns."""
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("Parquet export needs pyarrow")
+    writer = None
+    try:
+        for chunk in _chunks(df, chunk_rows, iso=False):
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(fh, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+WRITERS = {"csv": write_csv, "json": write_json, "parquet": write_parquet}
+
+
+def export_bytes(df: pd.DataFrame, fmt: str, chunk_rows: int = 100_000) -> bytes:
+    """df written in `fmt`."""
+    fh = io.BytesIO()
+    with stage(f"export {fmt}", rows=len(df)):
+        WRITERS[fmt](df, fh, chunk_rows)
+    # hands over the buffer without copying it
+    return fh.getvalue()
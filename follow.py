@@ -0,0 +1,261 @@
+# follow.py
+"""
+Tail/follow mode: incrementally parse a log file that keeps growing.
+Each `poll()` parses only the bytes appended since the previous one (plus an entry that was
+held back because it could still grow), so its cost is proportional to the new data.
+When the file goes quiet, the held-back last entry is shown anyway, as a provisional row
+that the next poll replaces if the entry turns out to have grown.
+The rows are appended to preallocated column arrays (`AppendOnlyFrame`), so the frame of
+everything parsed so far is a view, never a concatenation of every chunk.
+"""
+
+import os
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from ingest import LogBuffer
+from parser import parse_increment
+from profiles import LogProfile, detect_profile
+
+
+def _code_dtype(n_categories: int) -> np.dtype:
+    # the code width pandas itself picks, so Categorical.from_codes keeps the array as is
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+class _CategoricalColumn:
+    """Codes into a category list that is only ever appended to, so old codes stay valid."""
+
+    def __init__(self):
+        self.categories = np.empty(16, dtype=object)
+        self.n_categories = 0
+        self.ids: Dict = {}
+        self._dtype = None
+
+    def encode(self, col: pd.Series) -> np.ndarray:
+        """col's codes in this column's categories (new categories are added)."""
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            codes, uniques = col.cat.codes.to_numpy(), col.cat.categories
+        else:
+            codes, uniques = pd.factorize(col)
+        # only the categories the new rows use are looked up
+        used, inverse = np.unique(codes, return_inverse=True)
+        lookup = np.array([self._id(uniques[u]) if u >= 0 else -1 for u in used.tolist()], dtype=np.int64)
+        return lookup[inverse.reshape(-1)]
+
+    def _id(self, value) -> int:
+        i = self.ids.get(value)
+        if i is None:
+            i = self.ids[value] = self.n_categories
+            if i == len(self.categories):
+                self.categories = np.concatenate([self.categories, np.empty(i, dtype=object)])
+            self.categories[i] = value
+            self.n_categories += 1
+            self._dtype = None
+        return i
+
+    def dtype(self) -> pd.CategoricalDtype:
+        if self._dtype is None:
+            self._dtype = pd.CategoricalDtype(pd.Index(self.categories[:self.n_categories], dtype=object))
+        return self._dtype
+
+
+class AppendOnlyFrame:
+    """
+    Parsed rows appended chunk by chunk into column arrays that double their capacity when
+    full, so each row is copied O(1) times overall. Categorical columns keep one growing
+    category list (see _CategoricalColumn). `frame()` is a DataFrame over views of the
+    arrays: rows already returned never change, later rows are written past their end.
+    attrs counters of the chunks are summed.
+    """
+
+    def __init__(self):
+        self.n_rows = 0
+        self.attrs: Dict = {}
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._categorical: Dict[str, _CategoricalColumn] = {}
+
+    def _reserve(self, n_new: int) -> None:
+        need = self.n_rows + n_new
+        for name, arr in self._arrays.items():
+            if need > len(arr):
+                grown = self._empty(name, max(need, 2 * len(arr)), arr.dtype)
+                grown[:self.n_rows] = arr[:self.n_rows]
+                self._arrays[name] = grown
+
+    def _empty(self, name: str, size: int, dtype: np.dtype) -> np.ndarray:
+        # filled with the column's missing value, for rows of chunks that lack it
+        return np.full(size, self._missing(name, dtype), dtype=dtype)
+
+    def _missing(self, name: str, dtype: np.dtype):
+        if name in self._categorical:
+            return -1
+        if dtype.kind == "M":
+            return np.datetime64("NaT")
+        return None if dtype == object else np.nan
+
+    def append(self, chunk: pd.DataFrame) -> None:
+        for key, value in chunk.attrs.items():
+            if isinstance(value, (int, np.integer)):
+                self.attrs[key] = self.attrs.get(key, 0) + int(value)
+        if chunk.empty:
+            return
+        for name in chunk.columns:
+            if name not in self._arrays:
+                col = chunk[name]
+                if isinstance(col.dtype, pd.CategoricalDtype):
+                    self._categorical[name] = _CategoricalColumn()
+                    dtype = _code_dtype(0)
+                else:
+                    dtype = col.to_numpy().dtype
+                self._arrays[name] = self._empty(name, max(self.n_rows, 16), dtype)
+        self._reserve(len(chunk))
+        rows = slice(self.n_rows, self.n_rows + len(chunk))
+        for name, arr in self._arrays.items():
+            if name not in chunk.columns:
+                continue
+            if name in self._categorical:
+                column = self._categorical[name]
+                codes = column.encode(chunk[name])
+                width = _code_dtype(column.n_categories)
+                if width.itemsize > arr.itemsize:
+                    arr = self._arrays[name] = arr.astype(width)
+                arr[rows] = codes
+            else:
+                arr[rows] = chunk[name].to_numpy(dtype=arr.dtype)
+        self.n_rows += len(chunk)
+
+    def pop(self, chunk: pd.DataFrame) -> None:
+        """Undo append(chunk), which must be the last chunk appended."""
+        for key, value in chunk.attrs.items():
+            if isinstance(value, (int, np.integer)):
+                self.attrs[key] -= int(value)
+        start = self.n_rows - len(chunk)
+        for name, arr in self._arrays.items():
+            arr[start:self.n_rows] = self._missing(name, arr.dtype)
+        self.n_rows = start
+
+    def frame(self) -> pd.DataFrame:
+        columns = {}
+        for name, arr in self._arrays.items():
+            view = arr[:self.n_rows]
+            if name in self._categorical:
+                view = pd.Categorical.from_codes(view, dtype=self._categorical[name].dtype(), validate=False)
+            columns[name] = view
+        df = pd.DataFrame(columns, copy=False)
+        df.attrs.update(self.attrs)
+        return df
+
+
+class LogFollower:
+    """
+    path: log file to follow. The file is re-read from the start if it shrinks
+    (truncated or rotated in place).
+    profile: log-format profile; by default detected from the first poll that finds data,
+    then kept, so every increment is read the same way.
+    quiet_seconds: once the file has not grown for this long, a poll appends the entry held
+    back so far (if its lines are complete) as provisional rows. The next poll that finds new data parses that entry
+    again: if it comes out the same it stays, otherwise it is dropped and `generation` bumped.
+    """
+
+    def __init__(self, path: str, errors: str = "replace", profile: Optional[LogProfile] = None, quiet_seconds: float = 1.0):
+        self.path = path
+        self.quiet_seconds = quiet_seconds
+        self.errors = errors
+        self.fixed_profile = profile
+        self.profile = profile
+        self.offset = 0          # next byte to parse
+        self.size_seen = 0       # file size at the last poll
+        self.line_count = 0      # lines before `offset`
+        # bumped whenever the rows parsed so far are dropped: frames of one generation
+        # only ever grow, so structures built on them can be extended with the new rows
+        self.generation = 0
+        self._rows = AppendOnlyFrame()
+        self._frame = None
+        self._provisional: Optional[pd.DataFrame] = None
+        self._grown_at = 0.0
+        # a poll found the file quiet since it last grew
+        self._quiet_polled = False
+
+    def reset(self) -> None:
+        self.profile = self.fixed_profile
+        self.offset = self.size_seen = self.line_count = 0
+        self.generation += 1
+        self._rows = AppendOnlyFrame()
+        self._frame = None
+        self._provisional = None
+        self._quiet_polled = False
+
+    def has_new_data(self) -> bool:
+        """The file changed since the last poll, or went quiet with its last entry held back."""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return False
+        return size != self.size_seen or (self.offset < size and not self._quiet_polled and self._is_quiet())
+
+    def _is_quiet(self) -> bool:
+        return time.monotonic() - self._grown_at >= self.quiet_seconds
+
+    def poll(self) -> pd.DataFrame:
+        """Parse what was appended since the last poll; returns only the rows added to `frame`."""
+        size = os.path.getsize(self.path)
+        if size < self.offset:
+            self.reset()
+        grew = size != self.size_seen
+        self.size_seen = size
+        if size == self.offset or not (grew or (self._provisional is None and self._is_quiet())):
+            return pd.DataFrame()
+        self._quiet_polled = not grew
+        if grew:
+            self._grown_at = time.monotonic()
+        with LogBuffer(self.path) as buf:
+            if self.profile is None:
+                self.profile = detect_profile(buf.lines(0, min(size, len(buf))))
+            # the file may have grown between getsize() and mmap(): stop at `size`
+            end = min(size, len(buf))
+            if not grew:
+                # quiet: show the held-back entry, unless its last line is still partial
+                if buf.complete_end(self.offset, end) != end:
+                    return pd.DataFrame()
+                self._provisional, _ = parse_increment(buf, self.offset, end, final=True, errors=self.errors, profile=self.profile)
+                self._rows.append(self._provisional)
+                self._frame = None
+                return self._provisional
+            new_rows, self.offset = parse_increment(buf, self.offset, end, errors=self.errors, profile=self.profile)
+        self.line_count += new_rows.attrs["line_count"]
+        shown, kept = self._provisional, 0
+        if shown is not None:
+            # the entry shown provisionally is parsed again at the start of new_rows: rows
+            # that come out the same are written back unchanged, others start a new generation
+            self._provisional = None
+            self._rows.pop(shown)
+            self._frame = None
+            if _same_rows(new_rows.iloc[:len(shown)], shown):
+                kept = len(shown)
+            else:
+                self.generation += 1
+        if not new_rows.empty:
+            self._rows.append(new_rows)
+            self._frame = None
+        return new_rows.iloc[kept:]
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """All rows parsed so far, in log order (a view of the appended rows)."""
+        if self._frame is None:
+            self._frame = self._rows.frame()
+        df = self._frame
+        df.attrs["line_count"] = self.line_count + (self._provisional.attrs["line_count"] if self._provisional is not None else 0)
+        return df
+
+
+def _same_rows(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    # compared as values: the two parses have their own categories
+    return len(a) == len(b) and a.astype(object).reset_index(drop=True).equals(b.astype(object).reset_index(drop=True))
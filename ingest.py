@@ -0,0 +1,217 @@
+# ingest.py
+"""
+Byte-level ingestion of log files. `LogBuffer` memory-maps a file on disk (or wraps bytes
+already in memory without copying them) and `LineScanner` walks its lines with a bytes regex,
+counting them in the same pass. Nothing is decoded here: the parser decodes only the
+fields it captures.
+Compressed logs (gzip, bz2, xz, zstd) are recognised by their magic bytes and read as a
+decompressing stream instead; they are never expanded in memory as a whole.
+Files on the server itself can only be opened below the directory named by
+LOG_ANALYSER_SERVER_ROOT (see `resolve_server_path`); without it they cannot be opened.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import mmap
+import os
+import re
+import zlib
+from typing import IO, Iterator, Optional, Tuple, Union
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except Exception:
+    ZSTD_AVAILABLE = False
+
+# one line plus its terminator (\r\n, \r or \n: the same boundaries as bytes.splitlines),
+# or a last line without terminator
+LINE_RE = re.compile(rb"[^\r\n]*(?:\r\n|\r|\n)|[^\r\n]+")
+
+BufferSource = Union[str, os.PathLike, bytes, bytearray, memoryview]
+SERVER_ROOT_ENV = "LOG_ANALYSER_SERVER_ROOT"
+
+# leading bytes of each supported compressed format
+MAGIC_BYTES = (
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+)
+_OPENERS = {"gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+# what reading one damaged, truncated or unsupported file can raise (EOFError: a cut-off
+# compressed stream; RuntimeError: zstd input without the zstandard package)
+READ_ERRORS = (OSError, EOFError, lzma.LZMAError, zlib.error, ValueError, RuntimeError) + (
+    (zstandard.ZstdError,) if ZSTD_AVAILABLE else ()
+)
+
+
+def server_root() -> Optional[str]:
+    """The directory server-side logs may be opened from, resolved; None when not enabled."""
+    root = os.environ.get(SERVER_ROOT_ENV)
+    return os.path.realpath(root) if root else None
+
+
+def resolve_server_path(path: str, root: str) -> Optional[str]:
+    """
+    path (absolute, or relative to root) with symlinks and ".." resolved, or None when
+    the result lies outside root.
+    """
+    resolved = os.path.realpath(os.path.join(root, path))
+    return resolved if os.path.commonpath([resolved, root]) == root else None
+
+
+def detect_compression(head: bytes) -> Optional[str]:
+    """Compression format whose magic bytes start `head`, or None for plain data."""
+    for magic, name in MAGIC_BYTES:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def source_compression(source: BufferSource) -> Optional[str]:
+    """detect_compression() on the first bytes of a path or bytes-like source."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as fh:
+            head = fh.read(8)
+    else:
+        head = bytes(source[:8])
+    return detect_compression(head)
+
+
+def stream_compression(stream: IO[bytes]) -> Tuple[IO[bytes], Optional[str]]:
+    """
+    detect_compression() on a binary stream without consuming it: (stream to read from,
+    compression). A stream without peek() is returned wrapped in an io.BufferedReader;
+    one that has neither peek() nor readinto() cannot be checked and is a ValueError.
+    """
+    if not hasattr(stream, "peek"):
+        if not hasattr(stream, "readinto"):
+            raise ValueError("cannot check a binary stream without peek() or readinto() for compression; "
+                             "wrap it in io.BufferedReader")
+        stream = io.BufferedReader(stream)
+    return stream, detect_compression(stream.peek(8))
+
+
+def open_decompressed(source: Union[BufferSource, IO[bytes]], compression: str) -> IO[bytes]:
+    """Buffered binary stream of the decompressed contents of a path, bytes or binary file."""
+    if not isinstance(source, (str, os.PathLike)) and not hasattr(source, "read"):
+        # the (compressed) bytes are copied once; the output is decompressed on demand
+        source = io.BytesIO(source)
+    if compression == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstd-compressed input needs the zstandard package")
+        # the zstandard reader has no readline(): buffer it
+        return io.BufferedReader(zstandard.open(source, "rb"))
+    return _OPENERS[compression](source, "rb")
+
+
+def read_preview(source: BufferSource, n_bytes: int) -> bytes:
+    """First n_bytes of the (decompressed) contents of a path or bytes-like source."""
+    compression = source_compression(source)
+    if compression:
+        with open_decompressed(source, compression) as fh:
+            return fh.read(n_bytes)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as fh:
+            return fh.read(n_bytes)
+    return bytes(source[:n_bytes])
+
+
+class LogBuffer:
+    """
+    Read-only bytes view of a whole log. Paths are memory-mapped, so pages are loaded
+    by the OS on demand instead of being read into Python objects; bytes-like inputs
+    (e.g. `UploadedFile.getbuffer()`) are wrapped as-is.
+    """
+
+    def __init__(self, source: BufferSource):
+        self._fh: Optional[IO[bytes]] = None
+        self._mmap: Optional[mmap.mmap] = None
+        if isinstance(source, (str, os.PathLike)):
+            self.path = os.fspath(source)
+            self._fh = open(self.path, "rb")
+            if os.fstat(self._fh.fileno()).st_size:
+                self._mmap = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+                self.data = self._mmap
+            else:
+                # mmap refuses empty files
+                self.data = b""
+        else:
+            self.path = None
+            self.data = source
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __enter__(self) -> "LogBuffer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def head(self, n_bytes: int) -> bytes:
+        return bytes(self.data[:n_bytes])
+
+    def complete_end(self, start: int, end: int) -> int:
+        """
+        Offset just past the last line terminator in [start, end), i.e. where a file that is
+        still being written stops holding complete lines. A trailing \r is not counted: it
+        may be the first half of \r\n.
+        """
+        last = max(self.data.rfind(b"\n", start, end), self.data.rfind(b"\r", start, end - 1))
+        return last + 1 if last >= 0 else start
+
+    def lines(self, start: int = 0, end: Optional[int] = None) -> "LineScanner":
+        return LineScanner(self.data, start, len(self.data) if end is None else end)
+
+
+class LineScanner:
+    """
+    Iterates the lines (without terminators) of data[start:end] as bytes.
+    `line_count` is the number of lines returned so far, `line_start` the offset of the
+    most recently returned line and `offset` the offset just past it.
+    """
+
+    def __init__(self, data, start: int = 0, end: Optional[int] = None):
+        self._matches = LINE_RE.finditer(data, start, len(data) if end is None else end)
+        self.line_count = 0
+        self.line_start = start
+        self.offset = start
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self
+
+    def __next__(self) -> bytes:
+        m = next(self._matches)
+        self.line_count += 1
+        self.line_start, self.offset = m.span()
+        # terminators only ever appear at the end of a match
+        return m.group().rstrip(b"\r\n")
+
+
+class StreamLines:
+    """
+    Lines of a binary stream that cannot be memory-mapped (pipes, decompressors), with
+    LineScanner's boundaries; `line_count` is the number of lines returned so far.
+    """
+
+    def __init__(self, fh: IO[bytes]):
+        self._fh = fh
+        self.line_count = 0
+
+    def __iter__(self) -> Iterator[bytes]:
+        for raw in self._fh:
+            for line in raw.splitlines():
+                self.line_count += 1
+                yield line
@@ -0,0 +1,139 @@
+# instrument.py
+"""
+Per-stage timing and memory instrumentation.
+`with stage("parse") as rec:` times a block and records it in the current run (see
+`start_run`); set `rec["rows"]` to the number of rows it processed. Outside a run a stage
+only costs a context variable lookup, so library code (parser, charts, ...) can be
+instrumented unconditionally.
+
+Each stage records wall time and the change in resident memory. With
+LOG_ANALYSER_TRACEMALLOC=1 Python allocations are traced as well: a stage then also
+records its traced peak and its largest allocation sites (slow; for investigations).
+`finish_run` appends one JSON line per stage to LOG_ANALYSER_STAGE_LOG, if set.
+"""
+
+import contextvars
+import json
+import os
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except Exception:
+    PSUTIL_AVAILABLE = False
+
+STAGE_LOG_ENV = "LOG_ANALYSER_STAGE_LOG"
+TRACEMALLOC_ENV = "LOG_ANALYSER_TRACEMALLOC"
+TOP_ALLOCATIONS = 5
+
+_current: "contextvars.ContextVar[Optional[Run]]" = contextvars.ContextVar("instrument_run", default=None)
+
+
+def _rss_bytes() -> Optional[int]:
+    if PSUTIL_AVAILABLE:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class Run:
+    """Stages recorded during one app rerun (or one batch job), in the order they started."""
+
+    def __init__(self, label: str = "", trace: Optional[bool] = None):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.started = datetime.now(timezone.utc)
+        self.stages: List[Dict] = []
+        self.trace = os.environ.get(TRACEMALLOC_ENV, "") not in ("", "0") if trace is None else trace
+        # open stages: [record, traced peak of the finished part of the stage]
+        self._open: List[list] = []
+
+    def rows(self) -> List[Dict]:
+        """Stage records for display, nested stages indented under their parent."""
+        return [
+            {
+                "stage": "  " * rec["depth"] + rec["stage"],
+                "seconds": round(rec.get("seconds", 0.0), 4),
+                "rows": rec["rows"],
+                "memory delta (MB)": rec.get("rss_delta_mb"),
+                **({"traced peak (MB)": rec.get("traced_peak_mb")} if self.trace else {}),
+            }
+            for rec in self.stages
+        ]
+
+
+def start_run(label: str = "", trace: Optional[bool] = None) -> Run:
+    """Make a new run current for this thread (each Streamlit rerun has its own thread)."""
+    run = Run(label, trace)
+    if run.trace and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _current.set(run)
+    return run
+
+
+@contextmanager
+def recorded_run(label: str = "", trace: Optional[bool] = None) -> Iterator[Run]:
+    """A run for the enclosed block only (e.g. a download callback); logged when it ends."""
+    previous = _current.get()
+    run = start_run(label, trace)
+    try:
+        yield run
+    finally:
+        _current.set(previous)
+        finish_run(run)
+
+
+@contextmanager
+def stage(name: str, rows: Optional[int] = None) -> Iterator[Dict]:
+    """Record the enclosed block as a stage of the current run; yields its (mutable) record."""
+    run = _current.get()
+    rec = {"stage": name, "rows": rows}
+    if run is None:
+        yield rec
+        return
+    rec["depth"] = len(run._open)
+    run.stages.append(rec)
+    tracing = run.trace and tracemalloc.is_tracing()
+    if tracing:
+        if run._open:
+            # the parent's peak so far survives the reset below
+            run._open[-1][1] = max(run._open[-1][1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        snapshot = tracemalloc.take_snapshot()
+    run._open.append([rec, 0])
+    rss = _rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        rec["seconds"] = time.perf_counter() - start
+        end_rss = _rss_bytes()
+        rec["rss_delta_mb"] = round((end_rss - rss) / 2**20, 2) if rss is not None and end_rss is not None else None
+        _, own_peak = run._open.pop()
+        if tracing:
+            peak = max(own_peak, tracemalloc.get_traced_memory()[1])
+            rec["traced_peak_mb"] = round(peak / 2**20, 2)
+            top = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")[:TOP_ALLOCATIONS]
+            rec["top_allocations"] = [str(stat) for stat in top]
+            if run._open:
+                run._open[-1][1] = max(run._open[-1][1], peak)
+
+
+def finish_run(run: Run, path: Optional[str] = None) -> None:
+    """Append the run's stages as JSON lines to `path` (default: $LOG_ANALYSER_STAGE_LOG)."""
+    path = path or os.environ.get(STAGE_LOG_ENV)
+    if not path or not run.stages:
+        return
+    started = run.started.isoformat()
+    with open(path, "a", encoding="utf-8") as fh:
+        for rec in run.stages:
+            fh.write(json.dumps({"run_id": run.run_id, "label": run.label, "run_started": started, **rec}, default=str) + "\n")
@@ -0,0 +1,247 @@
+# log_index.py
+"""
+Persistent on-disk index of parsed logs, stored in SQLite.
+`LogIndex.load_or_parse(path)` returns the same frame as `extract_errors_from_buffer(path)`
+(with the same log-format profile, detected or given).
+Sources are identified by path, size, mtime and a hash of the first bytes: an unchanged file
+is loaded back without parsing, and a file that grew (or whose indexing was interrupted)
+is parsed only from the last checkpointed byte offset.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ingest import LogBuffer, source_compression
+from parser import BASE_COLUMNS, PARSER_VERSION, add_derived_columns, extract_errors_from_buffer, parse_increment
+from profiles import LogProfile
+
+# bytes hashed to recognise a file (and check that a grown file kept its beginning)
+HEAD_BYTES = 1 << 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    head_len INTEGER NOT NULL,
+    head_hash TEXT NOT NULL,
+    parser_version TEXT NOT NULL,
+    offset INTEGER NOT NULL,             -- checkpoint: bytes fully parsed
+    line_count INTEGER NOT NULL,         -- lines before offset
+    ts_fallbacks INTEGER NOT NULL,       -- timestamp fallbacks before offset
+    tail_line_count INTEGER NOT NULL DEFAULT 0,
+    tail_ts_fallbacks INTEGER NOT NULL DEFAULT 0,
+    complete INTEGER NOT NULL DEFAULT 0  -- whole file (as of size/mtime) indexed
+);
+CREATE TABLE IF NOT EXISTS tracebacks (
+    source_id INTEGER NOT NULL,
+    tb_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (source_id, tb_id)
+);
+CREATE TABLE IF NOT EXISTS entries (
+    source_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    ts_us INTEGER,
+    module TEXT,
+    level TEXT,
+    message TEXT,
+    exception TEXT,
+    exc_message TEXT,
+    category_key TEXT,
+    tb_id INTEGER NOT NULL,
+    provisional INTEGER NOT NULL DEFAULT 0,  -- last entry of the file, re-parsed on growth
+    PRIMARY KEY (source_id, seq)
+);
+"""
+
+_TEXT_COLUMNS = ("module", "level", "message", "exception", "exc_message", "category_key")
+
+
+def _head_hash(buf: LogBuffer, n_bytes: int) -> str:
+    return hashlib.blake2b(buf.data[:n_bytes], digest_size=16).hexdigest()
+
+
+# (database, path) -> lock held while that file is loaded or indexed
+_PATH_LOCKS: Dict[Tuple[str, str], threading.Lock] = {}
+_PATH_LOCKS_GUARD = threading.Lock()
+
+
+def _path_lock(db_path: str, path: str) -> threading.Lock:
+    with _PATH_LOCKS_GUARD:
+        return _PATH_LOCKS.setdefault((os.path.abspath(db_path), path), threading.Lock())
+
+
+def _sql_values(col: pd.Series) -> list:
+    col = col.astype(object)
+    return col.where(col.notna(), None).tolist()
+
+
+class LogIndex:
+    """
+    db_path: SQLite file holding the index (created if missing).
+    checkpoint_bytes: parsed rows are committed, and the resume offset advanced, after
+    every slice of about this many bytes.
+    Within a process one file is loaded or indexed by one thread at a time (app sessions
+    share the index); the others wait and then load what it wrote.
+    """
+
+    def __init__(self, db_path: str, checkpoint_bytes: int = 64 << 20):
+        self.db_path = db_path
+        self.checkpoint_bytes = checkpoint_bytes
+        parent = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(parent, exist_ok=True)
+        with closing(self._connect()) as con:
+            con.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.db_path)
+        con.row_factory = sqlite3.Row
+        return con
+
+    def _drop(self, con: sqlite3.Connection, source_id: int) -> None:
+        for table in ("entries", "tracebacks"):
+            con.execute(f"DELETE FROM {table} WHERE source_id = ?", (source_id,))
+        con.execute("DELETE FROM sources WHERE id = ?", (source_id,))
+
+    def load_or_parse(self, path: str, profile: Optional[LogProfile] = None) -> pd.DataFrame:
+        path = os.path.abspath(path)
+        if source_compression(path):
+            # byte offsets into a compressed file cannot be resumed from: parse it whole
+            return extract_errors_from_buffer(path, profile=profile)
+        with _path_lock(self.db_path, path):
+            return self._load_or_parse(path, profile)
+
+    def _load_or_parse(self, path: str, profile: Optional[LogProfile]) -> pd.DataFrame:
+        # a file indexed with another profile is parsed again, like one from another parser
+        version = PARSER_VERSION if profile is None else f"{PARSER_VERSION}:{profile.name}"
+        stat = os.stat(path)
+        with closing(self._connect()) as con, LogBuffer(path) as buf:
+            row = con.execute("SELECT * FROM sources WHERE path = ?", (path,)).fetchone()
+            if row is not None and (
+                row["parser_version"] != version
+                or len(buf) < row["offset"]
+                or _head_hash(buf, row["head_len"]) != row["head_hash"]
+            ):
+                # different parser, truncated or replaced file: start over
+                self._drop(con, row["id"])
+                con.commit()
+                row = None
+            if row is not None and row["complete"] and row["size"] == len(buf) and row["mtime"] == stat.st_mtime:
+                return self._load(con, row["id"])
+
+            if row is None:
+                # another process may have added the path since the SELECT: keep its row
+                con.execute(
+                    "INSERT OR IGNORE INTO sources (path, size, mtime, head_len, head_hash, parser_version, offset, line_count, ts_fallbacks)"
+                    " VALUES (?, ?, ?, ?, ?, ?, 0, 0, 0)",
+                    (path, len(buf), stat.st_mtime, min(len(buf), HEAD_BYTES), _head_hash(buf, HEAD_BYTES), version),
+                )
+                con.commit()
+                row = con.execute("SELECT * FROM sources WHERE path = ?", (path,)).fetchone()
+            self._parse_from(con, buf, row, stat.st_mtime, profile)
+            return self._load(con, row["id"])
+
+    def _parse_from(self, con: sqlite3.Connection, buf: LogBuffer, row: sqlite3.Row, mtime: float, profile: Optional[LogProfile] = None) -> None:
+        source_id = row["id"]
+        offset, line_count, fallbacks = row["offset"], row["line_count"], row["ts_fallbacks"]
+        size = len(buf)
+        # the provisional last entry may have grown: parse it again
+        con.execute("DELETE FROM entries WHERE source_id = ? AND provisional = 1", (source_id,))
+        tb_ids = {r["text"]: r["tb_id"] for r in con.execute("SELECT tb_id, text FROM tracebacks WHERE source_id = ?", (source_id,))}
+        seq = con.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM entries WHERE source_id = ?", (source_id,)).fetchone()[0]
+
+        while offset < size:
+            end = min(offset + self.checkpoint_bytes, size)
+            df, resume = parse_increment(buf, offset, end, profile=profile)
+            while resume == offset and end < size:
+                # an entry larger than the slice: widen until it completes
+                end = min(offset + 2 * (end - offset), size)
+                df, resume = parse_increment(buf, offset, end, profile=profile)
+            if resume == offset:
+                break
+            seq = self._write(con, source_id, df, seq, tb_ids, provisional=False)
+            offset = resume
+            line_count += df.attrs["line_count"]
+            fallbacks += df.attrs.get("timestamp_fallbacks", 0)
+            con.execute(
+                "UPDATE sources SET offset = ?, line_count = ?, ts_fallbacks = ? WHERE id = ?",
+                (offset, line_count, fallbacks, source_id),
+            )
+            con.commit()
+
+        tail_lines = tail_fallbacks = 0
+        if offset < size:
+            # whatever is held back (last entry, partial last line) as of now
+            tail, _ = parse_increment(buf, offset, size, final=True, profile=profile)
+            self._write(con, source_id, tail, seq, tb_ids, provisional=True)
+            tail_lines = tail.attrs["line_count"]
+            tail_fallbacks = tail.attrs.get("timestamp_fallbacks", 0)
+        con.execute(
+            "UPDATE sources SET size = ?, mtime = ?, head_len = ?, head_hash = ?, tail_line_count = ?,"
+            " tail_ts_fallbacks = ?, complete = 1 WHERE id = ?",
+            (size, mtime, min(size, HEAD_BYTES), _head_hash(buf, HEAD_BYTES), tail_lines, tail_fallbacks, source_id),
+        )
+        con.commit()
+
+    def _write(self, con: sqlite3.Connection, source_id: int, df: pd.DataFrame, seq: int, tb_ids: Dict[str, int], provisional: bool) -> int:
+        if df.empty:
+            return seq
+        tracebacks = df["raw_traceback"]
+        cat_ids = np.empty(len(tracebacks.cat.categories), dtype=np.int64)
+        new_tbs = []
+        for i, text in enumerate(tracebacks.cat.categories):
+            tb_id = tb_ids.get(text)
+            if tb_id is None:
+                tb_id = tb_ids[text] = len(tb_ids)
+                new_tbs.append((source_id, tb_id, text))
+            cat_ids[i] = tb_id
+        con.executemany("INSERT INTO tracebacks (source_id, tb_id, text) VALUES (?, ?, ?)", new_tbs)
+
+        ts = df["timestamp"]
+        ts_us = ts.astype("datetime64[us]").astype("int64").astype(object).where(ts.notna(), None).tolist()
+        columns = [_sql_values(df[col]) for col in _TEXT_COLUMNS]
+        tb_col = cat_ids[tracebacks.cat.codes.to_numpy()].tolist()
+        n = len(df)
+        con.executemany(
+            "INSERT INTO entries (source_id, seq, ts_us, module, level, message, exception,"
+            " exc_message, category_key, tb_id, provisional) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            zip([source_id] * n, range(seq, seq + n), ts_us, *columns, tb_col, [int(provisional)] * n),
+        )
+        return seq + n
+
+    def _load(self, con: sqlite3.Connection, source_id: int) -> pd.DataFrame:
+        row = con.execute("SELECT * FROM sources WHERE id = ?", (source_id,)).fetchone()
+        stored = pd.read_sql_query(
+            f"SELECT ts_us, {', '.join(_TEXT_COLUMNS)}, tb_id FROM entries WHERE source_id = ? ORDER BY seq",
+            con, params=(source_id,),
+        )
+        attrs = {
+            "line_count": row["line_count"] + row["tail_line_count"],
+            "timestamp_fallbacks": row["ts_fallbacks"] + row["tail_ts_fallbacks"],
+        }
+        if stored.empty:
+            df = pd.DataFrame()
+            df.attrs.update(attrs)
+            return df
+        texts = pd.read_sql_query("SELECT text FROM tracebacks WHERE source_id = ? ORDER BY tb_id", con, params=(source_id,))
+        df = stored[list(_TEXT_COLUMNS)].copy()
+        df.insert(0, "timestamp", pd.to_datetime(stored["ts_us"], unit="us"))
+        df["raw_traceback"] = pd.Categorical.from_codes(stored["tb_id"], categories=pd.Index(texts["text"], dtype=object))
+        df = add_derived_columns(df[list(BASE_COLUMNS)].copy())
+        df.attrs.update(attrs)
+        return df
+
+    def indexed_offset(self, path: str) -> Optional[int]:
+        """Checkpointed byte offset for `path`, or None if it was never indexed."""
+        with closing(self._connect()) as con:
+            row = con.execute("SELECT offset FROM sources WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        return None if row is None else row["offset"]
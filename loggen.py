@@ -0,0 +1,228 @@
+# loggen.py
+"""
+Synthetic log generator for benchmarks.
+Writes a reproducible mix of log entries (plain messages, single-line exceptions,
+entries followed by a traceback), traceback-only blocks and noise lines that the parser
+must skip. The output is written a block at a time, so any size can be generated in
+constant memory. Entries are written in one of FORMATS, named after the parser profiles
+that read them (see profiles.py); json entries carry their traceback in "exc_info".
+
+    python loggen.py bench.log --size 500MB --seed 1
+    python loggen.py bench.log.gz --size 2GB
+    python loggen.py bench.jsonl --size 500MB --format json
+"""
+
+import argparse
+import bisect
+import bz2
+import gzip
+import json
+import lzma
+import random
+import sys
+import time
+from itertools import accumulate
+from typing import IO, Dict, List, Optional, Sequence
+
+from errors_mapping import CATEGORY_MAPPING
+
+# kind of record -> share of records
+DEFAULT_MIX = {
+    "plain": 0.62,
+    "single_line": 0.12,
+    "traceback": 0.14,
+    "traceback_only": 0.04,
+    "noise": 0.08,
+}
+MODULES = (
+    "app.api", "app.api.orders", "app.worker", "auth", "billing", "db.pool", "scheduler",
+    "search.indexer", "storage.s3", "notifications",
+)
+LEVELS = ("DEBUG", "INFO", "INFO", "INFO", "WARNING", "ERROR", "ERROR", "CRITICAL")
+THREADS = ("MainThread", "Thread-1", "Thread-2", "ThreadPoolExecutor-0_0", "ThreadPoolExecutor-0_1")
+FORMATS = ("python", "python-thread", "json")
+# names as they show up in real logs: qualified, subclassed or only matched by suffix
+EXTRA_EXCEPTIONS = (
+    "requests.exceptions.ConnectionError", "requests.exceptions.ReadTimeout",
+    "sqlalchemy.exc.OperationalError", "psycopg2.errors.UniqueViolation",
+    "json.decoder.JSONDecodeError", "myapp.errors.PaymentDeclinedError",
+    "botocore.exceptions.ClientError", "asyncio.exceptions.CancelledError",
+)
+PLAIN_MESSAGES = (
+    "processed request id={n} in {ms}ms",
+    "cache hit ratio {pct}% over last {n} lookups",
+    "user {n} logged in",
+    "scheduled job finished",
+    "retrying upstream call (attempt {k})",
+    "GET /api/v1/orders/{n} 200",
+)
+NOISE_LINES = (
+    "",
+    "   continuation of the previous message {n}",
+    '{{"event": "metrics", "latency_ms": {ms}, "status": "ok"}}',
+    "-----",
+    "2024-13-45 99:99:99,999 - {module} - ERROR - malformed header {n}",
+    "WARNING: line {n} was truncated",
+)
+SIZE_UNITS = {"": 1, "B": 1, "KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30, "TB": 1 << 40}
+_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+
+def parse_size(text: str) -> int:
+    """'20MB', '1.5GB', '4096' -> bytes."""
+    text = text.strip().upper()
+    number = text.rstrip("KMGTB")
+    return int(float(number) * SIZE_UNITS[text[len(number):]])
+
+
+def exception_names() -> List[str]:
+    names = [e for info in CATEGORY_MAPPING.values() for e in info["errors"]]
+    return list(dict.fromkeys(names)) + list(EXTRA_EXCEPTIONS)
+
+
+class _Writer:
+    """Record generator; a few exceptions and modules dominate, as in real logs."""
+
+    def __init__(self, seed: int, mix: Dict[str, float], start: float, lines_per_second: float, fmt: str = "python"):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown format {fmt!r} (expected one of {', '.join(FORMATS)})")
+        self.fmt = fmt
+        self.rng = random.Random(seed)
+        self.kinds = list(mix)
+        self._kind_cum = list(accumulate(mix.values()))
+        self.exceptions = exception_names()
+        self.rng.shuffle(self.exceptions)
+        # Zipf-like weights: the i-th name is 1/(i+1) as likely as the first
+        self._exc_cum = list(accumulate(1.0 / (i + 1) for i in range(len(self.exceptions))))
+        self._module_cum = list(accumulate(1.0 / (i + 1) for i in range(len(MODULES))))
+        self.clock = start
+        self.mean_gap = 1.0 / lines_per_second
+        self.n = 0
+        self._second = None
+        self._second_text = ""
+
+    def _pick(self, items: Sequence[str], cum_weights: List[float]) -> str:
+        return items[bisect.bisect(cum_weights, self.rng.random() * cum_weights[-1])]
+
+    def _int(self, low: int, high: int) -> int:
+        # randint() without its argument checks, which dominate the generator's time
+        return low + int(self.rng.random() * (high - low + 1))
+
+    def timestamp(self) -> str:
+        self.clock += self.rng.expovariate(1.0 / self.mean_gap)
+        second = int(self.clock)
+        if second != self._second:
+            self._second = second
+            self._second_text = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(second))
+        return f"{self._second_text},{int((self.clock - second) * 1000):03d}"
+
+    def _fill(self, template: str, module: str) -> str:
+        return template.format(n=self.n, ms=self._int(1, 2000), pct=self._int(0, 100), k=self._int(1, 5), module=module)
+
+    def _traceback(self, module: str, exc: str) -> List[str]:
+        tb = ["Traceback (most recent call last):"]
+        path = module.replace(".", "/")
+        for depth in range(self._int(1, 6)):
+            tb.append(f'  File "/srv/{path}.py", line {self._int(1, 900)}, in handler_{depth}')
+            tb.append(f"    result = step_{depth}(payload)")
+        tb.append(f"{exc}: failed for object at 0x7f{self._int(0, 0xffffff):06x} (item {self.n % 97})")
+        return tb
+
+    def _entry(self, out: List[str], ts: str, module: str, level: str, message: str, tb: Optional[List[str]] = None) -> None:
+        if self.fmt == "json":
+            record = {"timestamp": f"{ts[:10]}T{ts[11:19]}.{ts[20:]}Z", "level": level, "logger": module, "message": message}
+            if tb:
+                record["exc_info"] = "\n".join(tb)
+            out.append(json.dumps(record))
+            return
+        if self.fmt == "python-thread":
+            out.append(f"{ts} - {module} - {THREADS[self._int(0, len(THREADS) - 1)]} - {level} - {message}")
+        else:
+            out.append(f"{ts} - {module} - {level} - {message}")
+        if tb:
+            out.extend(tb)
+
+    def record(self, out: List[str]) -> None:
+        self.n += 1
+        kind = self._pick(self.kinds, self._kind_cum)
+        module = self._pick(MODULES, self._module_cum)
+        if kind == "plain":
+            ts = self.timestamp()
+            level = LEVELS[self._int(0, len(LEVELS) - 1)]
+            self._entry(out, ts, module, level, self._fill(PLAIN_MESSAGES[self._int(0, len(PLAIN_MESSAGES) - 1)], module))
+        elif kind == "single_line":
+            exc = self._pick(self.exceptions, self._exc_cum)
+            self._entry(out, self.timestamp(), module, "ERROR", f"{exc}: request {self.n} failed")
+        elif kind == "traceback":
+            exc = self._pick(self.exceptions, self._exc_cum)
+            ts = self.timestamp()
+            self._entry(out, ts, module, "ERROR", f"Unhandled error while processing request {self.n}", self._traceback(module, exc))
+        elif kind == "traceback_only":
+            tb = self._traceback(module, self._pick(self.exceptions, self._exc_cum))
+            if self.fmt == "json":
+                # a JSON logger has no bare traceback lines: the block comes with a record
+                self._entry(out, self.timestamp(), module, "ERROR", "Uncaught exception", tb)
+            else:
+                out.extend(tb)
+        else:
+            out.append(self._fill(NOISE_LINES[self._int(0, len(NOISE_LINES) - 1)], module))
+
+
+def generate(
+    fh: IO[bytes],
+    size: int,
+    seed: int = 0,
+    mix: Optional[Dict[str, float]] = None,
+    start: float = 1704067200.0,
+    lines_per_second: float = 20.0,
+    block_bytes: int = 1 << 20,
+    fmt: str = "python",
+) -> int:
+    """
+    Write at least `size` bytes of log records to fh (stopping at the first record
+    boundary past it) and return the number of bytes written. The same seed and options
+    always give the same output.
+    """
+    writer = _Writer(seed, mix or DEFAULT_MIX, start, lines_per_second, fmt)
+    written = 0
+    while written < size:
+        lines: List[str] = []
+        block = 0
+        while block < block_bytes and written + block < size:
+            mark = len(lines)
+            writer.record(lines)
+            block += sum(map(len, lines[mark:])) + len(lines) - mark
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        fh.write(data)
+        written += len(data)
+    return written
+
+
+def generate_file(path: str, size: int, seed: int = 0, **options) -> int:
+    """generate() into `path`; a .gz/.bz2/.xz suffix compresses (`size` counts uncompressed bytes)."""
+    opener = next((o for suffix, o in _OPENERS.items() if path.endswith(suffix)), open)
+    with opener(path, "wb") as fh:
+        return generate(fh, size, seed, **options)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Write a synthetic log for benchmarks.")
+    ap.add_argument("output", help="file to write (- for stdout); .gz/.bz2/.xz compress")
+    ap.add_argument("--size", default="100MB", help="uncompressed size, e.g. 20MB or 10GB")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--lines-per-second", type=float, default=20.0, help="average rate of the timestamps")
+    ap.add_argument("--format", choices=FORMATS, default="python", help="layout of the entries")
+    for kind, share in DEFAULT_MIX.items():
+        ap.add_argument(f"--{kind.replace('_', '-')}", type=float, default=share, metavar="SHARE", help=f"relative share of {kind} records (default {share})")
+    args = ap.parse_args(argv)
+    mix = {kind: getattr(args, kind) for kind in DEFAULT_MIX}
+    size = parse_size(args.size)
+    if args.output == "-":
+        generate(sys.stdout.buffer, size, args.seed, mix=mix, lines_per_second=args.lines_per_second, fmt=args.format)
+    else:
+        generate_file(args.output, size, args.seed, mix=mix, lines_per_second=args.lines_per_second, fmt=args.format)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# parse_cache.py
+"""
+Cache of parsed DataFrames keyed by a hash of the raw log bytes and PARSER_VERSION.
+Keeps an in-memory LRU bounded by a byte budget and, optionally, pickles every entry to a
+directory so a new session (or a restarted server) opening the same file skips parsing.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import pandas as pd
+
+from parser import PARSER_VERSION
+
+
+def content_key(data) -> str:
+    """Cache key for raw log bytes (any bytes-like object; hashed without copying)."""
+    digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+    return f"{digest}-v{PARSER_VERSION}"
+
+
+class ParseCache:
+    """
+    max_bytes: memory budget for cached frames (measured with memory_usage(deep=True)).
+    cache_dir: optional directory for the on-disk layer; None disables it.
+    Cached frames are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int = 1 << 30, cache_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._frames: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        with self._lock:
+            df = self._frames.get(key)
+            if df is not None:
+                self._frames.move_to_end(key)
+                return df
+        if self.cache_dir and os.path.exists(self._disk_path(key)):
+            try:
+                df = pd.read_pickle(self._disk_path(key))
+            except Exception:
+                # unreadable/partial file: treat as a miss, it is rewritten on put()
+                return None
+            self._remember(key, df)
+            return df
+        return None
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        self._remember(key, df)
+        if self.cache_dir:
+            path = self._disk_path(key)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            df.to_pickle(tmp)
+            os.replace(tmp, path)
+
+    def _remember(self, key: str, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            self._frames[key] = df
+            self._sizes[key] = size
+            self._frames.move_to_end(key)
+            # evict least recently used, but always keep the newest entry
+            while len(self._frames) > 1 and self.used_bytes > self.max_bytes:
+                old_key, _ = self._frames.popitem(last=False)
+                del self._sizes[old_key]
+
+    def get_or_parse(self, data, parse: Callable[..., pd.DataFrame], key: Optional[str] = None) -> pd.DataFrame:
+        """Return the cached frame for `data`, calling `parse(data)` only on a miss."""
+        key = key or content_key(data)
+        df = self.get(key)
+        if df is None:
+            df = parse(data)
+            self.put(key, df)
+        return df
@@ -2,130 +2,818 @@
 """
 Log parsing functions. Provides `extract_errors_from_log_text(log_text)` that returns a pandas DataFrame
 with columns:
-  timestamp (datetime), timestamp_raw, module, level, message, exception, exc_message, category_key, raw_traceback
+  timestamp (datetime), module, level, message, exception, exc_message, category_key, raw_traceback
+
+`extract_errors_from_buffer(source)` parses a path (memory-mapped) or bytes without decoding
+the whole log first: lines are scanned as bytes (see ingest.py) and only captured fields are
+decoded. For large files, `iter_log_records(source)` / `iter_log_frames(source, chunk_size)`
+stream the same entries with memory bounded by the chunk size, and
+`extract_errors_parallel(source, workers)` parses header-aligned byte ranges on several cores.
+Every returned frame carries `attrs["line_count"]` (lines scanned) and
+`attrs["timestamp_fallbacks"]`. Lines end at \r\n, \r or \n on every path, text or bytes
+(str.splitlines would also split at \x0b, \x0c, \x1c-\x1e, \x85, \u2028 and \u2029).
+
+Entry header lines are read with a log-format profile (see profiles.py): every entry
+point takes a `profile`, and without one detects it from the first lines of the log.
+
+Frames use a compact schema: module, level, exception, category_key, category and
+raw_traceback are categoricals (each distinct traceback is stored once), message and
+exc_message too when they repeat enough to be smaller that way. Use `concat_frames` to combine frames, and expand a
+column with `.astype(object)` only where plain strings are needed.
+
+`fingerprint` identifies occurrences of the same crash: a hash of the exception type and
+the traceback's frames with line numbers and addresses removed. `group_occurrences(df)`
+collapses a frame to one row per fingerprint.
+
+Several logs (e.g. one per worker) are parsed one per process with `parse_sources` and
+combined with `merge_sources`, which interleaves them by time and tags every row with
+its `source`.
 """
 
+import hashlib
+import io
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from itertools import chain, islice
 from dateutil import parser as dateparser
+import numpy as np
 import pandas as pd
-from typing import Optional
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
-from errors_mapping import SUB_TO_CAT
+from errors_mapping import CLASSIFIER
+from ingest import BufferSource, LineScanner, LogBuffer, StreamLines, open_decompressed, source_compression, stream_compression
+from instrument import stage
+from profiles import DEFAULT_PROFILE, DETECT_LINES, ISO8601, HeaderFn, LogProfile, detect_profile, detect_profile_vote
 
-# Regex patterns (robust heuristics)
-LOG_LINE_RE = re.compile(
-    r'^(?P<ts>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3})\s*-\s*(?P<module>[^-]+?)\s*-\s*(?P<level>[A-Z]+)\s*-\s*(?P<message>.*)$'
-)
+# Bump whenever the parsed output for the same input changes (invalidates parse caches).
+# Custom classification rules change category_key too, so their signature is part of it.
+PARSER_VERSION = "7" + (f"+{CLASSIFIER.signature}" if CLASSIFIER.signature else "")
+
+# Regex patterns (robust heuristics); the header of the default log format is
+# DEFAULT_PROFILE's, other formats are profiles (see profiles.py)
+LOG_LINE_RE = DEFAULT_PROFILE.regex
 EXC_LINE_RE = re.compile(
     r'^\s*(?P<exc>[A-Za-z_][\w\.\:\-<>]*?(?:Error|Exception|Warning|Exit|Interrupt)?)\s*[:]\s*(?P<msg>.*)$'
 )
 SINGLELINE_EXC_RE = re.compile(
     r'(?P<exc>[A-Za-z_][\w\.\:\-<>]*?(?:Error|Exception|Warning|Exit|Interrupt)?)\s*[:\-]\s*(?P<msg>.+)$'
 )
+TRACEBACK_HEADER = "Traceback (most recent call last):"
+# line terminators of text input: the bytes scanner's (ingest.LINE_RE), not str.splitlines'
+TEXT_NEWLINE_RE = re.compile(r"\r\n|\r|\n")
+# traceback frame line; the line number is left out of fingerprints
+FRAME_RE = re.compile(r'^\s*File "(?P<file>[^"]*)", line \d+(?:, in (?P<func>.*))?$')
+# memory addresses (reprs, generated names) vary between runs of the same crash
+ADDRESS_RE = re.compile(r'0x[0-9a-fA-F]+')
+# columns produced by the line loop, in order; add_derived_columns appends the rest
+BASE_COLUMNS = (
+    "timestamp", "module", "level", "message",
+    "exception", "exc_message", "category_key", "raw_traceback",
+)
+# compact schema (see _compact): low-cardinality columns and the traceback table
+CATEGORICAL_COLUMNS = ("module", "level", "exception", "category_key", "category", "raw_traceback", "fingerprint")
+# categorical only when at most REPETITIVE_MAX_DISTINCT of the values are distinct: each
+# distinct value also costs a hash-table slot, so mostly unique text is smaller as objects
+REPETITIVE_COLUMNS = ("message", "exc_message")
+REPETITIVE_MAX_DISTINCT = 2 / 3
+
+# the layout LOG_LINE_RE's `ts` group enforces; anything else goes through dateutil
+TIMESTAMP_FORMAT = DEFAULT_PROFILE.timestamp_format
+
+# bytes twins used when scanning undecoded input (\d, \s match ASCII only there)
+LOG_LINE_RE_B = DEFAULT_PROFILE.regex_b
+TRACEBACK_HEADER_B = TRACEBACK_HEADER.encode()
+
+
+class _Dialect:
+    """
+    How `_iter_records` reads its lines: `str` lines as-is, or `bytes` lines matched with
+    the bytes patterns and decoded only for the parts that end up in an entry. `header`
+    is the profile's header function for that kind of line.
+    """
+
+    def __init__(self, errors: Optional[str] = None, profile: Optional[LogProfile] = None):
+        self.profile = profile or DEFAULT_PROFILE
+        if errors is None:
+            self.tb_header = TRACEBACK_HEADER
+            self.text = str
+        else:
+            self.tb_header = TRACEBACK_HEADER_B
+            self.text = partial(bytes.decode, encoding="utf-8", errors=errors)
+        self.header = self.profile.compile(self.text, errors is not None)
+
 
+_TEXT = _Dialect()
 
-def parse_timestamp(ts_str: str) -> Optional[pd.Timestamp]:
+
+def parse_timestamp(ts_str: str, timestamp_format: str = TIMESTAMP_FORMAT) -> Optional[pd.Timestamp]:
     try:
-        return dateparser.parse(ts_str.replace(',', '.'))
-    except Exception:
-        return None
+        if timestamp_format == ISO8601:
+            ts = datetime.fromisoformat(ts_str)
+        else:
+            ts = datetime.strptime(ts_str, timestamp_format)
+    except (TypeError, ValueError):
+        try:
+            ts = dateparser.parse(ts_str.replace(',', '.'))
+        except Exception:
+            return None
+    # timestamps with an offset are kept in UTC, like parse_timestamps does
+    if ts is not None and ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
 
 
-def extract_errors_from_log_text(log_text: str) -> pd.DataFrame:
-    lines = log_text.splitlines()
-    entries = []
-    i = 0
-    n = len(lines)
+def parse_timestamps(ts_raw: pd.Series, timestamp_format: str = TIMESTAMP_FORMAT) -> Tuple[pd.Series, int]:
+    """
+    Batch version of `parse_timestamp`: converts the whole column with the profile's
+    fixed format and only sends rows that fail it to dateutil. Timestamps with an offset
+    are converted to UTC (the column itself is timezone-naive).
+    Returns (timestamps, number of rows that needed the dateutil fallback).
+    """
+    if timestamp_format == TIMESTAMP_FORMAT:
+        # ISO 8601 but for the decimal comma: pandas parses ISO 8601 in C and strptime
+        # formats row by row (about ten times slower); the few rows ISO rejects (a leap
+        # second) get the strict format below
+        ts = pd.to_datetime(ts_raw.str.replace(",", ".", regex=False), format=ISO8601, errors="coerce", utc=True).dt.tz_localize(None)
+        failed = ts.isna() & ts_raw.notna()
+        if failed.any():
+            # fillna aligns on the index and returns a new Series: .dt results must not be
+            # assigned into (SettingWithCopyWarning)
+            ts = ts.fillna(pd.to_datetime(ts_raw[failed], format=timestamp_format, errors="coerce", utc=True).dt.tz_localize(None))
+    else:
+        ts = pd.to_datetime(ts_raw, format=timestamp_format, errors="coerce", utc=True).dt.tz_localize(None)
+    failed = ts.isna() & ts_raw.notna()
+    n_fallback = int(failed.sum())
+    if n_fallback:
+        ts = ts.fillna(pd.to_datetime(ts_raw[failed].map(partial(parse_timestamp, timestamp_format=timestamp_format)), errors="coerce"))
+    return ts, n_fallback
 
-    while i < n:
-        line = lines[i].rstrip("\n")
-        m = LOG_LINE_RE.match(line)
-        if m:
-            ts_raw = m.group("ts")
-            ts = parse_timestamp(ts_raw)
-            module = m.group("module").strip()
-            level = m.group("level").strip()
-            message = m.group("message").strip()
+
+def _text_lines(text: str) -> List[str]:
+    """text split into lines at the boundaries ingest.LINE_RE uses for bytes."""
+    lines = TEXT_NEWLINE_RE.split(text)
+    if lines[-1] == "":
+        # a final terminator ends the last line, it does not start another
+        lines.pop()
+    return lines
+
+
+def _iter_text_lines(fh: IO[str]) -> Iterator[str]:
+    # for streams opened with newline="" this yields exactly the lines
+    # _text_lines() would give for the whole text
+    for raw in fh:
+        yield from _text_lines(raw)
+
+
+class _ParseState:
+    """Side channel of `_iter_records`: where the input ended relative to the last entry."""
+
+    def __init__(self):
+        # True when the input ran out inside a traceback block (no exception line yet)
+        self.open_traceback = False
+        # True when the last entry touched the end of input (its traceback never closed,
+        # or its header was the final line so a traceback could still follow)
+        self.open_entry = False
+        # for LineScanner input: offset and preceding line count of the last entry
+        self.entry_start = 0
+        self.entry_line = 0
+        # the profile the lines were read with (set once it is detected)
+        self.profile: Optional[LogProfile] = None
+
+
+def _iter_records(lines: Iterable, state: Optional[_ParseState] = None, dialect: _Dialect = _TEXT) -> Iterator[Dict]:
+    """
+    Line state machine shared by every entry point. `lines` is consumed lazily with a
+    single line of lookahead, so a traceback block is followed across any read or chunk
+    boundary of the underlying source.
+    """
+    if state is None:
+        state = _ParseState()
+    text = dialect.text
+    tb_header = dialect.tb_header
+    header = dialect.header
+    it = iter(lines)
+    scanner = it if isinstance(it, LineScanner) else None
+    line = next(it, None)
+
+    # each regex is skipped when a cheap check shows it cannot match, so the output is
+    # unchanged: EXC_LINE_RE needs a ':' and SINGLELINE_EXC_RE a ':' or '-' (profiles
+    # prefilter their header lines the same way). Most lines of a typical log fail these checks.
+    while line is not None:
+        state.open_traceback = False
+        fields = header(line)
+        if fields:
+            if scanner is not None:
+                state.entry_start = scanner.line_start
+                state.entry_line = scanner.line_count - 1
+            ts_raw, module, level, message, embedded_tb = fields
 
             exc_name = None
             exc_msg = ""
-            single_m = SINGLELINE_EXC_RE.search(message)
+            single_m = SINGLELINE_EXC_RE.search(message) if (":" in message or "-" in message) else None
             if single_m:
                 exc_name = single_m.group("exc")
                 exc_msg = single_m.group("msg").strip()
 
             raw_tb = ""
+            line = next(it, None)
+            state.open_entry = line is None
+            if embedded_tb:
+                # traceback carried by the entry itself (a JSON field)
+                raw_tb = embedded_tb
+                for tb_line in embedded_tb.splitlines():
+                    ex_m = EXC_LINE_RE.match(tb_line.strip()) if ":" in tb_line else None
+                    if ex_m:
+                        exc_name = ex_m.group("exc")
+                        exc_msg = ex_m.group("msg").strip()
+                        break
             # capture traceback block if next line begins with Traceback...
-            if (i + 1) < n and lines[i + 1].lstrip().startswith("Traceback (most recent call last):"):
+            elif line is not None and line.lstrip().startswith(tb_header):
                 tb_lines = []
-                j = i + 1
-                while j < n:
-                    tb_lines.append(lines[j])
-                    ex_m = EXC_LINE_RE.match(lines[j].strip())
+                while line is not None:
+                    tb_line = text(line)
+                    tb_lines.append(tb_line)
+                    ex_m = EXC_LINE_RE.match(tb_line.strip()) if ":" in tb_line else None
+                    line = next(it, None)
                     if ex_m:
                         exc_name = ex_m.group("exc")
                         exc_msg = ex_m.group("msg").strip()
-                        j += 1
                         break
-                    j += 1
+                else:
+                    state.open_traceback = state.open_entry = True
                 raw_tb = "\n".join(tb_lines)
-                i = j - 1
 
-            if not exc_name:
+            if not exc_name and ":" in message:
                 ex_m2 = EXC_LINE_RE.search(message)
                 if ex_m2:
                     exc_name = ex_m2.group("exc")
                     exc_msg = ex_m2.group("msg").strip()
 
-            cat_key = SUB_TO_CAT.get(exc_name)
-
-            entries.append({
-                "timestamp": ts,
-                "timestamp_raw": ts_raw if ts else None,
+            # timestamps are converted and exceptions classified per batch in _records_to_frame
+            yield {
+                "timestamp": None,
+                "timestamp_raw": ts_raw,
                 "module": module or None,
                 "level": level or None,
                 "message": message,
                 "exception": exc_name,
                 "exc_message": exc_msg or "",
-                "category_key": cat_key,
+                "category_key": None,
                 "raw_traceback": raw_tb
-            })
-        else:
+            }
+        elif line.lstrip().startswith(tb_header):
             # traceback-only segment
-            if line.lstrip().startswith("Traceback (most recent call last):"):
-                tb_lines = [line]
-                j = i + 1
-                exc_name = None
-                exc_msg = ""
-                while j < n:
-                    tb_lines.append(lines[j])
-                    ex_m = EXC_LINE_RE.match(lines[j].strip())
-                    if ex_m:
-                        exc_name = ex_m.group("exc")
-                        exc_msg = ex_m.group("msg").strip()
-                        break
-                    j += 1
-                cat_key = SUB_TO_CAT.get(exc_name)
-                entries.append({
-                    "timestamp": None,
-                    "timestamp_raw": None,
-                    "module": None,
-                    "level": "ERROR",
-                    "message": "(traceback-only entry)",
-                    "exception": exc_name,
-                    "exc_message": exc_msg or "",
-                    "category_key": cat_key,
-                    "raw_traceback": "\n".join(tb_lines)
-                })
-                i = j
-        i += 1
-
-    df = pd.DataFrame(entries)
+            if scanner is not None:
+                state.entry_start = scanner.line_start
+                state.entry_line = scanner.line_count - 1
+            state.open_entry = False
+            tb_lines = [text(line)]
+            exc_name = None
+            exc_msg = ""
+            line = next(it, None)
+            while line is not None:
+                tb_line = text(line)
+                tb_lines.append(tb_line)
+                ex_m = EXC_LINE_RE.match(tb_line.strip()) if ":" in tb_line else None
+                line = next(it, None)
+                if ex_m:
+                    exc_name = ex_m.group("exc")
+                    exc_msg = ex_m.group("msg").strip()
+                    break
+            else:
+                state.open_traceback = state.open_entry = True
+            yield {
+                "timestamp": None,
+                "timestamp_raw": None,
+                "module": None,
+                "level": "ERROR",
+                "message": "(traceback-only entry)",
+                "exception": exc_name,
+                "exc_message": exc_msg or "",
+                "category_key": None,
+                "raw_traceback": "\n".join(tb_lines)
+            }
+        else:
+            line = next(it, None)
+
+
+def _compact(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert string columns to the compact schema in place: CATEGORICAL_COLUMNS always
+    become categoricals (raw_traceback included, so every distinct traceback is stored
+    once in `.cat.categories` and rows hold an integer code), REPETITIVE_COLUMNS only
+    when they repeat enough to be worth it.
+    """
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    for col in REPETITIVE_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            # one hashing pass decides and builds it; the categories stay in first-seen order
+            codes, uniques = pd.factorize(df[col])
+            if len(uniques) <= len(df) * REPETITIVE_MAX_DISTINCT:
+                df[col] = pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(uniques), validate=False)
+    return df
+
+
+def _scan(lines: Iterable, dialect: _Dialect = _TEXT, state: Optional[_ParseState] = None) -> List[Dict]:
+    # bytes dialects decode the captured fields here too
+    with stage("scan lines") as rec:
+        entries = list(_iter_records(lines, state, dialect))
+        rec["rows"] = len(entries)
+    return entries
+
+
+def _records_to_frame(entries: List[Dict], timestamp_format: str = TIMESTAMP_FORMAT) -> pd.DataFrame:
+    with stage("build frame", rows=len(entries)):
+        df = pd.DataFrame(entries)
     if df.empty:
         return df
+    with stage("timestamps", rows=len(df)):
+        # the text is only needed to parse: one string object per row is not kept
+        df["timestamp"], n_fallback = parse_timestamps(df.pop("timestamp_raw"), timestamp_format)
+    # rows whose timestamp did not match the profile's format (log format drift)
+    df.attrs["timestamp_fallbacks"] = n_fallback
+    with stage("classify", rows=len(df)):
+        df["category_key"] = CLASSIFIER.classify_series(df["exception"])
+    with stage("derived columns", rows=len(df)):
+        return add_derived_columns(df)
+
+
+def traceback_fingerprint(exc_name: Optional[str], raw_tb: str) -> Optional[str]:
+    """
+    Stable id of a crash: hash of the exception type and the (file, function) frames of
+    its traceback, without line numbers or addresses. None without an exception.
+    """
+    if not exc_name:
+        return None
+    parts = [ADDRESS_RE.sub("0x?", exc_name)]
+    for tb_line in raw_tb.splitlines():
+        m = FRAME_RE.match(tb_line)
+        if m:
+            parts.append(ADDRESS_RE.sub("0x?", f"{m.group('file')}:{m.group('func') or ''}"))
+    return hashlib.blake2b("\n".join(parts).encode("utf-8", "surrogatepass"), digest_size=8).hexdigest()
+
+
+def _fingerprints(df: pd.DataFrame) -> pd.Categorical:
+    # one hash per distinct (exception, traceback) pair, broadcast to rows through the codes;
+    # nothing is cached across frames, so no traceback outlives its parse
+    exc = df["exception"].astype("category")
+    tb = df["raw_traceback"].astype("category")
+    exc_codes = exc.cat.codes.to_numpy().astype(np.int64)
+    tb_codes = tb.cat.codes.to_numpy().astype(np.int64)
+    pairs, rows = np.unique((tb_codes + 1) * (len(exc.cat.categories) + 1) + exc_codes + 1, return_inverse=True)
+    exc_values = np.append(exc.cat.categories.to_numpy(dtype=object), None)
+    tb_values = np.append(tb.cat.categories.to_numpy(dtype=object), "")
+    per_pair = [
+        traceback_fingerprint(exc_values[pair % (len(exc_values)) - 1], tb_values[pair // len(exc_values) - 1])
+        for pair in pairs.tolist()
+    ]
+    return pd.Categorical(np.asarray(per_pair, dtype=object)[rows.reshape(-1)])
+
+
+def add_derived_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Complete a frame holding the BASE_COLUMNS (timestamp already converted): compact
+    schema plus the derived category, fingerprint and date columns. Used for freshly parsed
+    entries and for entries loaded back from storage.
+    """
+    _compact(df)
     # Add derived columns
     from errors_mapping import CATEGORY_MAPPING  # avoid circular at top
+    # category_key is categorical here, so this maps each distinct key once
     df["category"] = df["category_key"].map(lambda k: CATEGORY_MAPPING[k]["category"] if k in CATEGORY_MAPPING else ("Unknown" if pd.notnull(k) else None))
-    df["date"] = df["timestamp"].dt.date
-    df["time"] = df["timestamp"].dt.time
+    df["fingerprint"] = _fingerprints(df)
+    _compact(df)
+    # one date object per distinct day rather than per row
+    days, day_index = pd.factorize(df["timestamp"].dt.normalize())
+    df["date"] = pd.Categorical.from_codes(days, categories=pd.Index(day_index.date, dtype=object))
+    # no per-row time-of-day column: derive it where shown (df["timestamp"].dt.time)
     return df
+
+
+def concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    pd.concat(frames, ignore_index=True) for parser output that keeps the compact schema:
+    categorical columns get a shared category list first instead of being expanded to
+    strings. attrs counters are summed.
+    """
+    counters = {}
+    for f in frames:
+        for name, value in f.attrs.items():
+            counters[name] = counters.get(name, 0) + value
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        df = pd.DataFrame()
+        df.attrs.update(counters)
+        return df
+    if len(frames) == 1:
+        df = _compact(pd.concat(frames, ignore_index=True))
+        df.attrs = counters
+        return df
+    columns = list(dict.fromkeys(col for f in frames for col in f.columns))
+    shared = {}
+    for col in columns:
+        series = [f[col] for f in frames if col in f.columns]
+        if all(isinstance(s.dtype, pd.CategoricalDtype) for s in series):
+            # union in order of first appearance
+            cats = series[0].cat.categories.append([s.cat.categories for s in series[1:]]).unique()
+            # recode each frame's codes into the shared list and join the codes directly:
+            # pd.concat would re-hash the (large) category lists to compare them
+            codes = [
+                np.append(cats.get_indexer(f[col].cat.categories), -1)[f[col].cat.codes.to_numpy()]
+                if col in f.columns else np.full(len(f), -1)
+                for f in frames
+            ]
+            shared[col] = pd.Categorical.from_codes(np.concatenate(codes), dtype=pd.CategoricalDtype(cats))
+    df = pd.concat([f.drop(columns=[c for c in shared if c in f.columns]) for f in frames], ignore_index=True)
+    for col, values in shared.items():
+        df[col] = values
+    df = _compact(df[columns])
+    df.attrs = counters
+    return df
+
+
+def group_occurrences(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per fingerprint: exception, count, first_seen, last_seen and a representative
+    (first seen) traceback, most frequent first. Rows without a fingerprint are left out.
+    """
+    columns = ["fingerprint", "exception", "category", "count", "first_seen", "last_seen", "exc_message", "raw_traceback"]
+    if df.empty or "fingerprint" not in df.columns:
+        return pd.DataFrame(columns=columns)
+    grouped = df.groupby("fingerprint", observed=True, sort=False)
+    # positional first row of each group is its representative occurrence
+    first = df.loc[grouped.head(1).index].set_index("fingerprint")
+    out = pd.DataFrame({
+        "count": grouped.size(),
+        "first_seen": grouped["timestamp"].min(),
+        "last_seen": grouped["timestamp"].max(),
+    })
+    for col in ("exception", "category", "exc_message", "raw_traceback"):
+        out[col] = first[col].reindex(out.index)
+    out = out.reset_index()
+    return out.sort_values("count", ascending=False, kind="stable").reset_index(drop=True)[columns]
+
+
+def extract_errors_from_log_text(log_text: str, workers: int = 1, profile: Optional[LogProfile] = None) -> pd.DataFrame:
+    """
+    Parse a whole log held in memory. With workers > 1 the text is split into
+    header-aligned ranges parsed in a process pool (see `extract_errors_parallel`).
+    Without a `profile` the log format is detected from the first lines.
+    """
+    if workers > 1:
+        return extract_errors_parallel(log_text.encode("utf-8", errors="surrogatepass"), workers=workers, errors="surrogatepass", profile=profile)
+    with stage("parse") as rec:
+        lines = _text_lines(log_text)
+        profile = profile or detect_profile(lines)
+        df = _records_to_frame(_scan(lines, _Dialect(profile=profile)), profile.timestamp_format)
+        df.attrs["line_count"] = rec["rows"] = len(lines)
+    return df
+
+
+def detect_source_profile(source: BufferSource) -> Tuple[LogProfile, bool]:
+    """
+    The profile the parser detects for a log (path or bytes-like, compressed or not), and
+    whether the vote was clear (see `detect_profile_vote`).
+    """
+    compression = source_compression(source)
+    if compression:
+        with open_decompressed(source, compression) as fh:
+            return detect_profile_vote(StreamLines(fh))
+    with LogBuffer(source) as buf:
+        return detect_profile_vote(buf.lines())
+
+
+def _buffer_profile(buf: LogBuffer, profile: Optional[LogProfile]) -> LogProfile:
+    # detected from the start of the log, so all ranges and increments of a log agree
+    return profile or detect_profile(buf.lines())
+
+
+def extract_errors_from_buffer(source: BufferSource, workers: int = 1, errors: str = "replace", profile: Optional[LogProfile] = None) -> pd.DataFrame:
+    """
+    Parse a log file path (memory-mapped) or bytes-like object without decoding it as a
+    whole; same output as `extract_errors_from_log_text` on the decoded text.
+    Compressed input is detected and decompressed on the fly (always serially).
+    """
+    compression = source_compression(source)
+    if workers > 1 and not compression:
+        return extract_errors_parallel(source, workers=workers, errors=errors, profile=profile)
+    with stage("parse") as rec:
+        if compression:
+            # decompressed as a stream: compressed data can be neither mapped nor split
+            if profile is None:
+                with open_decompressed(source, compression) as fh:
+                    profile = detect_profile(StreamLines(fh))
+            with open_decompressed(source, compression) as fh:
+                lines = StreamLines(fh)
+                df = _records_to_frame(_scan(lines, _Dialect(errors, profile)), profile.timestamp_format)
+        else:
+            with LogBuffer(source) as buf:
+                profile = _buffer_profile(buf, profile)
+                lines = buf.lines()
+                df = _records_to_frame(_scan(lines, _Dialect(errors, profile)), profile.timestamp_format)
+        df.attrs["line_count"] = rec["rows"] = lines.line_count
+    return df
+
+
+def parse_increment(buf: LogBuffer, start: int, end: Optional[int] = None, final: bool = False, errors: str = "replace",
+                    profile: Optional[LogProfile] = None) -> Tuple[pd.DataFrame, int]:
+    """
+    Parse the complete entries in buf[start:end] for incremental readers (follow mode,
+    resumable indexing). A trailing partial line is never read, and unless `final` the
+    last entry is held back while it may still grow (header on the last line, or a
+    traceback without its exception line yet). Without a `profile` it is detected from
+    the start of buf.
+    Returns (frame, offset to resume from); frame.attrs["line_count"] counts the lines
+    before that offset.
+    """
+    end = len(buf) if end is None else end
+    if not final:
+        end = buf.complete_end(start, end)
+    profile = _buffer_profile(buf, profile)
+    lines = buf.lines(start, end)
+    state = _ParseState()
+    entries = _scan(lines, _Dialect(errors, profile), state)
+    resume, line_count = lines.offset, lines.line_count
+    if entries and state.open_entry and not final:
+        entries.pop()
+        resume, line_count = state.entry_start, state.entry_line
+    df = _records_to_frame(entries, profile.timestamp_format)
+    df.attrs["line_count"] = line_count
+    return df, max(resume, start)
+
+
+def _find_range_starts(buf: LogBuffer, n_ranges: int, header: HeaderFn) -> List[int]:
+    """
+    Byte offsets that cut the buffer into about `n_ranges` pieces. Every cut is moved
+    forward to the start of the next header line (`header`: the profile's header
+    function for bytes), so a range never begins inside an entry or its traceback block.
+    """
+    size = len(buf)
+    starts = [0]
+    for k in range(1, n_ranges):
+        guess = max(size * k // n_ranges, starts[-1] + 1)
+        if guess >= size:
+            break
+        # scanning from the byte before the guess first finishes the line it falls in
+        lines = buf.lines(guess - 1)
+        next(lines, None)
+        for line in lines:
+            if header(line):
+                starts.append(lines.line_start)
+                break
+        else:
+            break
+    return starts
+
+
+def _parse_range(task: Tuple) -> Tuple[pd.DataFrame, Optional[int]]:
+    """
+    Process-pool worker: parse one byte range. Unless it is the `final` range, an entry
+    whose traceback block is still open at the end is left out: the serial parser would
+    carry the block on into the next range. Returns (frame, offset of that entry relative
+    to the range start, or None).
+    """
+    source, start, end, errors, profile, final = task
+    with LogBuffer(source) as buf:
+        lines = buf.lines(start, end)
+        state = _ParseState()
+        entries = _scan(lines, _Dialect(errors, profile), state)
+        line_count, held_back = lines.line_count, None
+        if state.open_traceback and not final:
+            entries.pop()
+            line_count, held_back = state.entry_line, state.entry_start - start
+        df = _records_to_frame(entries, profile.timestamp_format)
+        df.attrs["line_count"] = line_count
+    return df, held_back
+
+
+def _block_end(buf: LogBuffer, start: int, dialect: _Dialect) -> int:
+    """
+    Offset just past the line that closes a traceback block still open at `start` (its
+    exception line, as _iter_records finds it); the end of buf when no line does.
+    """
+    lines = buf.lines(start)
+    for line in lines:
+        tb_line = dialect.text(line)
+        if ":" in tb_line and EXC_LINE_RE.match(tb_line.strip()):
+            return lines.offset
+    return len(buf)
+
+
+def extract_errors_parallel(
+    source: BufferSource,
+    workers: Optional[int] = None,
+    errors: str = "replace",
+    min_range_bytes: int = 1 << 20,
+    profile: Optional[LogProfile] = None,
+) -> pd.DataFrame:
+    """
+    Parse a log file (path) or bytes on several cores. The input is split into byte
+    ranges that start on header lines, each range is parsed in a process pool
+    and the partial frames are concatenated in file order. The result equals the serial
+    parser's: when a range ends inside an unterminated traceback, that entry is parsed
+    again from its first line through the end of the range where the block closes, and
+    the ranges in between are skipped.
+    """
+    if source_compression(source):
+        return extract_errors_from_buffer(source, errors=errors, profile=profile)
+    workers = workers or os.cpu_count() or 1
+    with stage("parse (parallel)") as rec, LogBuffer(source) as buf:
+        size = len(buf)
+        n_ranges = min(workers * 4, max(1, size // min_range_bytes))
+        profile = _buffer_profile(buf, profile)
+        dialect = _Dialect(errors, profile)
+        starts = _find_range_starts(buf, n_ranges, dialect.header)
+        bounds = list(zip(starts, starts[1:] + [size]))
+
+        def task(start, end):
+            if buf.path is None:
+                # in-memory input: ship the slice, workers cannot map it themselves
+                return bytes(buf.data[start:end]), 0, end - start, errors, profile, end == size
+            return buf.path, start, end, errors, profile, end == size
+
+        if len(bounds) == 1 or workers == 1:
+            results = [_parse_range(task(s, e)) for s, e in bounds]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(bounds))) as pool:
+                results = list(pool.map(_parse_range, [task(s, e) for s, e in bounds]))
+
+        frames = []
+        i, start = 0, bounds[0][0]
+        frame, held_back = results[0]
+        while True:
+            frames.append(frame)
+            if held_back is None:
+                i += 1
+                if i == len(bounds):
+                    break
+                start = bounds[i][0]
+                frame, held_back = results[i]
+                continue
+            # serially the open block swallows lines up to its exception line: parse its
+            # entry once more, through the end of the range where the block closes
+            start += held_back
+            close = _block_end(buf, bounds[i][1], dialect)
+            i += 1
+            while i + 1 < len(bounds) and bounds[i][1] < close:
+                i += 1
+            frame, held_back = _parse_range(task(start, bounds[i][1]))
+
+        with stage("concat"):
+            df = concat_frames(frames)
+        rec["rows"] = df.attrs.get("line_count")
+    return df
+
+
+def _parse_source(task: Tuple) -> pd.DataFrame:
+    source, errors, profile = task
+    return extract_errors_from_buffer(source, errors=errors, profile=profile)
+
+
+def parse_sources(sources: Sequence[BufferSource], workers: Optional[int] = None, errors: str = "replace",
+                  profile: Optional[LogProfile] = None) -> List[pd.DataFrame]:
+    """
+    Parse several logs (paths or bytes-like objects) concurrently, one process per log;
+    frames are returned in the order of `sources`. Without a `profile` each log's format
+    is detected on its own.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(sources))
+    if workers <= 1:
+        return [extract_errors_from_buffer(source, errors=errors, profile=profile) for source in sources]
+    # in-memory input is shipped to the workers; paths are opened (mapped) there
+    tasks = [(source if isinstance(source, (str, os.PathLike)) else bytes(source), errors, profile) for source in sources]
+    with stage("parse sources", rows=len(sources)), ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_parse_source, tasks))
+
+
+def time_order_key(ts: pd.Series, after: Optional[int] = None) -> np.ndarray:
+    """
+    int64 merge key per row: the timestamp, carried forward over rows without one
+    (traceback-only blocks stay after the entry they follow) and never decreasing, so a
+    late line stays where it was logged. Rows before the first timestamp sort first.
+    after: last key of the rows before these (rows appended to a followed log).
+    """
+    # NaT is the smallest int64, so the running maximum also does the forward fill
+    keys = np.maximum.accumulate(ts.to_numpy(dtype="datetime64[ns]").view(np.int64))
+    return keys if after is None else np.maximum(keys, after)
+
+
+def time_window(keys: np.ndarray, start, end) -> slice:
+    """
+    Rows logged between `start` and `end` (inclusive) of a frame in time order, from its
+    `time_order_key` (sorted by construction), by binary search: O(log n), and
+    df.iloc[window] is a view of the rows, not a copy. Rows before the first timestamp
+    fall outside every window.
+    """
+    lo = np.searchsorted(keys, pd.Timestamp(start).value, side="left")
+    hi = np.searchsorted(keys, pd.Timestamp(end).value, side="right")
+    return slice(int(lo), int(max(lo, hi)))
+
+
+def merge_order(keys: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    k-way merge of sorted runs: positions, in the runs' concatenation, of the rows in
+    merged order. Equal keys keep the order of their runs, as heapq.merge would.
+    NumPy's stable sort of int64 is a timsort, which finds the already sorted runs and
+    only merges them (O(n log k) for k runs), so this is the merge done in C rather than
+    a re-sort.
+    """
+    if not len(keys):
+        return np.empty(0, dtype=np.int64)
+    return np.argsort(np.concatenate([np.asarray(k, dtype=np.int64) for k in keys]), kind="stable")
+
+
+def merge_sources(frames: Sequence[pd.DataFrame], names: Sequence[str]) -> pd.DataFrame:
+    """
+    Combine the frames of several logs (each in log order) into one, interleaved by time
+    (see `time_order_key`) with a k-way merge rather than a sort, and tagged with a
+    categorical `source` column holding `names`. attrs counters are summed.
+    """
+    names = list(names)
+    tagged = [
+        f.assign(source=pd.Categorical.from_codes(np.full(len(f), i), categories=names))
+        for i, f in enumerate(frames)
+    ]
+    with stage("merge sources", rows=sum(len(f) for f in frames)):
+        df = concat_frames(tagged)
+        if df.empty:
+            return df
+        order = merge_order([time_order_key(f["timestamp"]) for f in tagged if not f.empty])
+        attrs = dict(df.attrs)
+        df = df.take(order).reset_index(drop=True)
+        df.attrs = attrs
+    return df
+
+
+def _iter_profiled(lines: Iterable, errors: Optional[str], profile: Optional[LogProfile], state: _ParseState) -> Iterator[Dict]:
+    # without a profile, the first lines are read ahead to detect one (and parsed after)
+    it = iter(lines)
+    if profile is None:
+        head = list(islice(it, DETECT_LINES))
+        profile = detect_profile(head)
+        it = chain(head, it)
+    state.profile = profile
+    yield from _iter_records(it, state, _Dialect(errors, profile))
+
+
+def _iter_source_records(source: Union[BufferSource, IO], profile: Optional[LogProfile], state: _ParseState) -> Iterator[Dict]:
+    if isinstance(source, io.TextIOBase):
+        yield from _iter_profiled(_iter_text_lines(source), None, profile, state)
+    elif hasattr(source, "read"):
+        stream, compression = stream_compression(source)
+        try:
+            if compression:
+                with open_decompressed(stream, compression) as fh:
+                    yield from _iter_profiled(StreamLines(fh), "replace", profile, state)
+            else:
+                yield from _iter_profiled(StreamLines(stream), "replace", profile, state)
+        finally:
+            if stream is not source and not stream.closed:
+                # the caller owns source: the wrapper must not close it
+                stream.detach()
+    else:
+        compression = source_compression(source)
+        if compression:
+            with open_decompressed(source, compression) as fh:
+                yield from _iter_profiled(StreamLines(fh), "replace", profile, state)
+        else:
+            with LogBuffer(source) as buf:
+                yield from _iter_profiled(buf.lines(), "replace", profile, state)
+
+
+def iter_log_records(source: Union[BufferSource, IO], profile: Optional[LogProfile] = None) -> Iterator[Dict]:
+    """
+    Stream parsed entries (one dict per occurrence, same keys as the DataFrame columns
+    before the derived ones) from a path, bytes, or an open text/binary file object.
+    Only the current line and the traceback block being collected are held in memory.
+    """
+    state = _ParseState()
+    for entry in _iter_source_records(source, profile, state):
+        entry["category_key"] = CLASSIFIER.classify(entry["exception"])
+        ts_raw = entry.pop("timestamp_raw")
+        if ts_raw is not None:
+            entry["timestamp"] = parse_timestamp(ts_raw, state.profile.timestamp_format)
+        yield entry
+
+
+def iter_log_frames(source: Union[BufferSource, IO], chunk_size: int = 100_000, profile: Optional[LogProfile] = None) -> Iterator[pd.DataFrame]:
+    """
+    Like `iter_log_records` but yields DataFrames (same schema as
+    `extract_errors_from_log_text`) of at most `chunk_size` rows each.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be >= 1")
+    state = _ParseState()
+    batch = []
+    for entry in _iter_source_records(source, profile, state):
+        batch.append(entry)
+        if len(batch) >= chunk_size:
+            yield _records_to_frame(batch, state.profile.timestamp_format)
+            batch = []
+    if batch:
+        yield _records_to_frame(batch, state.profile.timestamp_format)
@@ -0,0 +1,332 @@
+# profiles.py
+"""
+Log-format profiles: how the header line of a log entry is recognised and split into
+timestamp, module, level and message. The parser's line loop (tracebacks, exception
+detection) is the same for every profile; only the header step changes.
+
+  RegexProfile      named groups ts, module, level and message
+  DelimitedProfile  fields at fixed positions between a delimiter (str.split, no regex)
+  JsonProfile       one JSON object per line (json.loads, no regex); a traceback may be
+                    embedded in one of its fields
+
+`profile.compile(text, binary)` returns the profile's header function for str or bytes
+lines, with its pattern, delimiter or keys bound: line -> (ts, module, level, message,
+traceback or None), or None when the line is not a header.
+`detect_profile(lines)` picks the profile that reads most of the first DETECT_LINES lines
+as headers whose timestamp parses in its format. A close vote (a mixed sample, e.g. a
+JSON preamble before plain log lines) falls back to DEFAULT_PROFILE, and
+`detect_profile_vote` reports it so callers can warn. Profiles are looked up by name in PROFILES; add more with `register_profile`, or
+list them in a JSON file named by LOG_ANALYSER_PROFILES (see `load_profiles`).
+"""
+
+import json
+import os
+import re
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+Header = Optional[Tuple[str, str, str, str, Optional[str]]]
+HeaderFn = Callable[..., Header]
+
+# lines sampled by detect_profile
+DETECT_LINES = 200
+# a detected profile must read at least this many times the runner-up's lines (in a log
+# of one format the others read next to none; tracebacks keep the winner's share low)
+DETECT_MARGIN = 10
+# pandas' format for ISO 8601 timestamps of any precision and offset
+ISO8601 = "ISO8601"
+PROFILES_ENV = "LOG_ANALYSER_PROFILES"
+
+
+class LogProfile:
+    """
+    name: key in PROFILES (and in parse caches, when a profile is chosen explicitly).
+    timestamp_format: format of the `ts` field for pd.to_datetime (strptime codes, or
+    ISO8601); timestamps with an offset are converted to UTC.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, timestamp_format: str):
+        self.name = name
+        self.timestamp_format = timestamp_format
+
+    def compile(self, text: Callable, binary: bool) -> HeaderFn:
+        """Header function for lines of bytes (binary) or str; `text` decodes a field."""
+        raise NotImplementedError
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class RegexProfile(LogProfile):
+    """
+    pattern: regex with the named groups ts, module, level and message, matched at the
+    start of the line. digit_start: header lines start with a digit, so other lines skip
+    the regex.
+    """
+
+    kind = "regex"
+
+    def __init__(self, name: str, pattern: str, timestamp_format: str, digit_start: bool = False):
+        super().__init__(name, timestamp_format)
+        self.regex = re.compile(pattern)
+        missing = {"ts", "module", "level", "message"} - set(self.regex.groupindex)
+        if missing:
+            raise ValueError(f"profile {name!r}: pattern lacks the group(s) {', '.join(sorted(missing))}")
+        # bytes twin for undecoded input (\d, \s match ASCII only there)
+        self.regex_b = re.compile(pattern.encode())
+        self.digit_start = digit_start
+
+    def compile(self, text: Callable, binary: bool) -> HeaderFn:
+        match = (self.regex_b if binary else self.regex).match
+        digit_start = self.digit_start
+
+        def header(line):
+            if digit_start and not line[:1].isdigit():
+                return None
+            m = match(line)
+            if m is None:
+                return None
+            return (text(m["ts"]), text(m["module"]).strip(), text(m["level"]).strip().upper(),
+                    text(m["message"]).strip(), None)
+        return header
+
+
+class DelimitedProfile(LogProfile):
+    """
+    delimiter: separator between fields. fields: name of each field in order, one of
+    ts, module, level, message (last; it keeps any further delimiters) or None to skip
+    it. A line is a header when it has every field, its timestamp starts with a digit
+    and its level is an upper-case word.
+    """
+
+    kind = "delimited"
+
+    def __init__(self, name: str, delimiter: str, fields: Sequence[Optional[str]], timestamp_format: str):
+        super().__init__(name, timestamp_format)
+        fields = list(fields)
+        if not delimiter:
+            raise ValueError(f"profile {name!r}: empty delimiter")
+        if fields.count("message") != 1 or fields[-1] != "message" or "ts" not in fields:
+            raise ValueError(f"profile {name!r}: fields need a ts and end with message")
+        self.delimiter = delimiter
+        self.fields = fields
+
+    def compile(self, text: Callable, binary: bool) -> HeaderFn:
+        delimiter = self.delimiter.encode() if binary else self.delimiter
+        n_splits = len(self.fields) - 1
+        n_fields = len(self.fields)
+        i_ts = self.fields.index("ts")
+        i_msg = n_fields - 1
+        i_module = self.fields.index("module") if "module" in self.fields else None
+        i_level = self.fields.index("level") if "level" in self.fields else None
+
+        def header(line):
+            parts = line.split(delimiter, n_splits)
+            if len(parts) != n_fields:
+                return None
+            ts = parts[i_ts].strip()
+            if not ts[:1].isdigit():
+                return None
+            level = parts[i_level].strip() if i_level is not None else None
+            if level is not None and not (level.isalpha() and level.isupper()):
+                return None
+            return (text(ts), text(parts[i_module]).strip() if i_module is not None else "",
+                    text(level) if level is not None else "", text(parts[i_msg]).strip(), None)
+        return header
+
+
+class JsonProfile(LogProfile):
+    """
+    One JSON object per line. Each field is read from the first of its candidate keys the
+    object has; a line is a header when it has a timestamp or a message. Numeric
+    timestamps are taken as Unix epoch seconds (milliseconds when very large).
+    """
+
+    kind = "json"
+
+    def __init__(
+        self,
+        name: str,
+        ts_keys: Sequence[str] = ("timestamp", "time", "ts", "@timestamp", "asctime", "datetime"),
+        module_keys: Sequence[str] = ("logger", "name", "logger_name", "module"),
+        level_keys: Sequence[str] = ("level", "levelname", "severity", "log.level"),
+        message_keys: Sequence[str] = ("message", "msg", "event", "@message"),
+        traceback_keys: Sequence[str] = ("exc_info", "traceback", "stack_trace", "exception", "stack"),
+        timestamp_format: str = ISO8601,
+    ):
+        super().__init__(name, timestamp_format)
+        self.ts_keys = tuple(ts_keys)
+        self.module_keys = tuple(module_keys)
+        self.level_keys = tuple(level_keys)
+        self.message_keys = tuple(message_keys)
+        self.traceback_keys = tuple(traceback_keys)
+
+    def compile(self, text: Callable, binary: bool) -> HeaderFn:
+        loads = json.loads
+        brace = b"{" if binary else "{"
+        ts_keys, module_keys, level_keys = self.ts_keys, self.module_keys, self.level_keys
+        message_keys, traceback_keys = self.message_keys, self.traceback_keys
+
+        def first(obj, keys):
+            for key in keys:
+                value = obj.get(key)
+                if value is not None:
+                    return value
+            return None
+
+        def header(line):
+            if line[:1] != brace:
+                return None
+            try:
+                # json.loads decodes UTF-8 bytes itself; invalid bytes take the `text` route
+                obj = loads(line)
+            except UnicodeDecodeError:
+                try:
+                    obj = loads(text(line))
+                except ValueError:
+                    return None
+            except ValueError:
+                return None
+            if not isinstance(obj, dict):
+                return None
+            ts = first(obj, ts_keys)
+            message = first(obj, message_keys)
+            if ts is None and message is None:
+                return None
+            if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+                ts = _epoch_text(ts)
+            tb = first(obj, traceback_keys)
+            if isinstance(tb, list):
+                tb = "\n".join(map(str, tb))
+            elif tb is not None and not isinstance(tb, str):
+                # e.g. {"type": ..., "message": ...}: no traceback text to show
+                tb = None
+            module = first(obj, module_keys)
+            level = first(obj, level_keys)
+            return (
+                None if ts is None else str(ts),
+                "" if module is None else str(module).strip(),
+                "" if level is None else str(level).strip().upper(),
+                "" if message is None else str(message).strip(),
+                tb or None,
+            )
+        return header
+
+
+def _epoch_text(value: float) -> str:
+    seconds = value / 1000 if value > 1e11 else value
+    try:
+        return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+    except (OverflowError, OSError, ValueError):
+        return str(value)
+
+
+# the layout the parser has always read: "2024-01-01 12:00:00,123 - module - LEVEL - message"
+DEFAULT_PROFILE = RegexProfile(
+    "python",
+    r'^(?P<ts>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3})\s*-\s*(?P<module>[^-]+?)\s*-\s*(?P<level>[A-Z]+)\s*-\s*(?P<message>.*)$',
+    "%Y-%m-%d %H:%M:%S,%f",
+    digit_start=True,
+)
+
+# built-in profiles, in the order detect_profile prefers them on a tie
+PROFILES: Dict[str, LogProfile] = {}
+
+
+def register_profile(profile: LogProfile) -> LogProfile:
+    """Add (or replace) a profile in PROFILES, for explicit use and detection."""
+    PROFILES[profile.name] = profile
+    return profile
+
+
+register_profile(DEFAULT_PROFILE)
+# logging format "%(asctime)s - %(name)s - %(threadName)s - %(levelname)s - %(message)s"
+register_profile(DelimitedProfile("python-thread", " - ", ("ts", "module", None, "level", "message"), "%Y-%m-%d %H:%M:%S,%f"))
+# nginx error log: "2024/01/01 12:00:00 [error] 1234#1234: *5 connect() failed ..."; the
+# worker's pid#tid stands in for the module
+register_profile(RegexProfile(
+    "nginx-error",
+    r'^(?P<ts>\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2}) \[(?P<level>[a-z]+)\] (?P<module>\d+#\d+): (?P<message>.*)$',
+    "%Y/%m/%d %H:%M:%S",
+    digit_start=True,
+))
+register_profile(JsonProfile("json"))
+
+
+def rank_profiles(lines: Iterable, profiles: Optional[Sequence[LogProfile]] = None,
+                  sample: int = DETECT_LINES) -> List[Tuple[LogProfile, int]]:
+    """
+    (profile, score) for each profile, best first (ties keep the PROFILES order). The score
+    counts the first `sample` lines (str or bytes) the profile reads as a header whose
+    timestamp parses in the profile's format.
+    """
+    # imported here: the app's landing page reads PROFILES without loading pandas
+    import pandas as pd
+
+    head = list(islice(lines, sample))
+    binary = bool(head) and not isinstance(head[0], str)
+    text = (lambda b: bytes(b).decode("utf-8", errors="replace")) if binary else str
+    scores = []
+    for profile in profiles if profiles is not None else list(PROFILES.values()):
+        header = profile.compile(text, binary)
+        stamps = [h[0] for h in map(header, head) if h and h[0]]
+        parsed = pd.to_datetime(pd.Series(stamps, dtype=object), format=profile.timestamp_format, errors="coerce", utc=True)
+        scores.append((profile, int(parsed.notna().sum())))
+    return sorted(scores, key=lambda ps: -ps[1])
+
+
+def detect_profile_vote(lines: Iterable, profiles: Optional[Sequence[LogProfile]] = None,
+                        sample: int = DETECT_LINES) -> Tuple[LogProfile, bool]:
+    """
+    (detected profile, whether the vote was clear). The best-ranked profile wins when it
+    scores at least DETECT_MARGIN times the runner-up; otherwise DEFAULT_PROFILE is used
+    if it read any line at all. No line read by any profile: DEFAULT_PROFILE, not clear
+    (clear for an empty sample).
+    """
+    head = list(islice(lines, sample))
+    if not head:
+        return DEFAULT_PROFILE, True
+    ranked = rank_profiles(head, profiles, sample)
+    best, score = ranked[0] if ranked else (DEFAULT_PROFILE, 0)
+    if not score:
+        return DEFAULT_PROFILE, False
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0
+    if score >= DETECT_MARGIN * runner_up:
+        return best, True
+    if best is not DEFAULT_PROFILE and dict(ranked).get(DEFAULT_PROFILE):
+        return DEFAULT_PROFILE, False
+    return best, False
+
+
+def detect_profile(lines: Iterable, profiles: Optional[Sequence[LogProfile]] = None, sample: int = DETECT_LINES) -> LogProfile:
+    """The profile to read lines with (see detect_profile_vote); DEFAULT_PROFILE when none reads any."""
+    return detect_profile_vote(lines, profiles, sample)[0]
+
+
+def profile_from_dict(spec: Dict) -> LogProfile:
+    """
+    A profile from its JSON description: {"name", "kind": "regex" | "delimited" | "json",
+    "timestamp_format", ...} plus the keyword arguments of that kind's class.
+    """
+    spec = dict(spec)
+    kind = spec.pop("kind", "regex")
+    classes = {cls.kind: cls for cls in (RegexProfile, DelimitedProfile, JsonProfile)}
+    if kind not in classes:
+        raise ValueError(f"unknown profile kind {kind!r} (expected one of {', '.join(classes)})")
+    return classes[kind](**spec)
+
+
+def load_profiles(path: Optional[str]) -> List[LogProfile]:
+    """Profiles from a JSON file holding a list of profile_from_dict() descriptions. No path, none."""
+    if not path:
+        return []
+    with open(path, encoding="utf-8") as fh:
+        return [profile_from_dict(spec) for spec in json.load(fh)]
+
+
+# LOG_ANALYSER_PROFILES names a file of extra profiles (see load_profiles)
+for _profile in load_profiles(os.environ.get(PROFILES_ENV)):
+    register_profile(_profile)
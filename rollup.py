@@ -0,0 +1,95 @@
+# rollup.py
+"""
+Pre-aggregated timeline counts, built once per parsed log.
+For each resolution (minute / hour / day) the cube holds the number of entries per
+time bucket and (exception, module, level, category, source) combination (`source` only
+for merged uploads). Timelines for a set of exceptions are re-aggregations of those few
+rows instead of group-bys over every entry. Rows appended to a followed log are added
+with `extend`, which counts only them and merges their counts into the tables.
+"""
+
+from typing import Dict, Optional, Sequence, Tuple
+
+import pandas as pd
+
+# resolution name -> pandas frequency used to floor timestamps
+RESOLUTIONS = {"minute": "min", "hour": "h", "day": "D"}
+DIMENSIONS = ("module", "level", "exception", "category", "source")
+
+
+def pick_resolution(span_seconds: float) -> str:
+    """Bucket size for a timeline covering `span_seconds`."""
+    if span_seconds <= 3600 * 6:
+        return "minute"
+    if span_seconds <= 3600 * 24 * 10:
+        return "hour"
+    return "day"
+
+
+class RollupCube:
+    """
+    df: parsed frame; rows without a timestamp are left out, as in the timelines.
+    The table of a resolution is built the first time it is asked for.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.dimensions = tuple(d for d in DIMENSIONS if d in df.columns)
+        # timed rows, one part per extend(); tables not built yet are counted from them
+        self._parts = [self._timed_rows(df)]
+        self._tables: Dict[str, pd.DataFrame] = {}
+        # exact first/last timestamp per exception, to pick a resolution for any subset
+        self.spans = self._spans(self._parts[0])
+
+    def _timed_rows(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df.loc[df["timestamp"].notna(), ["timestamp", *self.dimensions]]
+
+    @staticmethod
+    def _spans(timed: pd.DataFrame) -> pd.DataFrame:
+        grouped = timed.groupby("exception", observed=True, dropna=False)["timestamp"]
+        return pd.DataFrame({"first": grouped.min(), "last": grouped.max()})
+
+    def _count(self, timed: pd.DataFrame, resolution: str) -> pd.DataFrame:
+        bucket = timed["timestamp"].dt.floor(RESOLUTIONS[resolution]).rename("bucket")
+        # dropna=False: a row missing e.g. its module still counts for its level
+        counts = timed.groupby([bucket] + [timed[d] for d in self.dimensions], observed=True, dropna=False).size()
+        return counts.reset_index(name="count")
+
+    def _merge(self, tables: Sequence[pd.DataFrame]) -> pd.DataFrame:
+        merged = pd.concat(tables, ignore_index=True)
+        return merged.groupby(["bucket", *self.dimensions], observed=True, dropna=False)["count"].sum().reset_index()
+
+    def table(self, resolution: str) -> pd.DataFrame:
+        """Columns ['bucket', *dimensions, 'count'] at this resolution."""
+        if resolution not in self._tables:
+            tables = [self._count(part, resolution) for part in self._parts]
+            self._tables[resolution] = tables[0] if len(tables) == 1 else self._merge(tables)
+        return self._tables[resolution]
+
+    def extend(self, new_rows: pd.DataFrame) -> "RollupCube":
+        """Add rows appended to the frame the cube was built on; returns the cube."""
+        timed = self._timed_rows(new_rows)
+        if timed.empty:
+            return self
+        self._parts.append(timed)
+        for resolution, table in self._tables.items():
+            self._tables[resolution] = self._merge([table, self._count(timed, resolution)])
+        spans = pd.concat([self.spans, self._spans(timed)]).groupby(level=0, dropna=False)
+        self.spans = pd.DataFrame({"first": spans["first"].min(), "last": spans["last"].max()})
+        return self
+
+    def _rows(self, table: pd.DataFrame, exceptions: Optional[Sequence[str]]) -> pd.DataFrame:
+        if exceptions is None:
+            return table
+        return table[table["exception"].isin(exceptions)]
+
+    def span(self, exceptions: Optional[Sequence[str]] = None) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """(first, last) timestamp of the entries with these exceptions, or None if there are none."""
+        spans = self.spans if exceptions is None else self.spans[self.spans.index.isin(exceptions)]
+        if spans.empty:
+            return None
+        return spans["first"].min(), spans["last"].max()
+
+    def counts(self, resolution: str, dimension: str, exceptions: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Columns ['bucket', dimension, 'count'], as a row group-by of the same entries would give."""
+        rows = self._rows(self.table(resolution), exceptions)
+        return rows.groupby(["bucket", dimension], observed=True)["count"].sum().reset_index()
@@ -0,0 +1,232 @@
+# search_index.py
+"""
+Search index for the app's search box, built once per parsed log.
+The searched columns are reduced to their distinct lower-cased values (the parser's
+categoricals already are); a query is answered on those values only, through an n-gram
+inverted index, and broadcast to rows through the integer codes, so its cost depends on
+the distinct text, not on the number of occurrences. Matches keep the semantics of
+`col.fillna("").str.lower().str.contains(q)`, regex queries included.
+Rows appended to a followed log are added with `extend`: only their values are looked
+up, and only values not seen before are added to the index.
+"""
+
+import re
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+SEARCH_COLUMNS = ("exception", "exc_message", "message", "module")
+_REGEX_CHARS = set(".^$*+?{}[]\\|()")
+
+
+class _ColumnIndex:
+    """
+    Distinct values of one column. Literal lookups use an n-gram inverted index (n-gram ->
+    value ids) while the column has at most `max_gram_values` distinct values; beyond that
+    building the postings costs more than it saves, and the values are instead joined
+    into one string that is scanned with str.find.
+    """
+
+    def __init__(self, col: pd.Series, ngram: int, max_gram_values: int):
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            codes = col.cat.codes.to_numpy()
+            uniques = col.cat.categories
+        else:
+            codes, uniques = pd.factorize(col)
+        self.codes = codes
+        self.ngram = ngram
+        self.max_gram_values = max_gram_values
+        # lower-cased distinct values; missing rows (code -1) read the trailing ""
+        self.values = [str(v).lower() for v in uniques] + [""]
+        self.use_grams = len(self.values) <= max_gram_values
+        self._uniques = uniques
+        self._ids = None
+        self._grams = None
+        # postings of values added by extend(), merged into _grams when a query needs them
+        self._new_grams: Dict[str, list] = {}
+        self._joined = None
+
+    def extend(self, col: pd.Series) -> None:
+        """Append the rows of col; values seen before keep their id."""
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            codes, uniques = col.cat.codes.to_numpy(), col.cat.categories
+        else:
+            codes, uniques = pd.factorize(col)
+        if self._ids is None:
+            self._ids = {v: i for i, v in enumerate(self._uniques)}
+            self._uniques = None
+        sentinel = self.values.pop()
+        first_new = len(self.values)
+        # only the values the new rows use are looked up
+        used, inverse = np.unique(codes, return_inverse=True)
+        ids = np.empty(len(used), dtype=np.int64)
+        for k, u in enumerate(used.tolist()):
+            if u < 0:
+                ids[k] = -1
+                continue
+            value = uniques[u]
+            i = self._ids.get(value)
+            if i is None:
+                i = self._ids[value] = len(self.values)
+                self.values.append(str(value).lower())
+                if self._grams is not None:
+                    self._add_grams(i, self.values[i])
+            ids[k] = i
+        if not first_new:
+            self._joined = None
+        elif self._joined is not None and len(self.values) > first_new:
+            self._extend_joined(self.values[first_new:])
+        self.values.append(sentinel)
+        self.codes = np.concatenate([self.codes, ids[inverse.reshape(-1)]])
+        if self.use_grams and len(self.values) > self.max_gram_values:
+            self.use_grams = False
+            self._grams, self._new_grams = None, {}
+
+    def _add_grams(self, value_id: int, value: str) -> None:
+        n = self.ngram
+        for gram in {value[i:i + n] for i in range(len(value) - n + 1)}:
+            self._new_grams.setdefault(gram, []).append(value_id)
+
+    def _gram_postings(self) -> Dict[str, np.ndarray]:
+        if self._grams is None:
+            self._new_grams = {}
+            n = self.ngram
+            postings: Dict[str, list] = {}
+            for value_id, value in enumerate(self.values):
+                for gram in {value[i:i + n] for i in range(len(value) - n + 1)}:
+                    postings.setdefault(gram, []).append(value_id)
+            self._grams = {gram: np.asarray(ids, dtype=np.int64) for gram, ids in postings.items()}
+        return self._grams
+
+    def _candidates(self, q: str) -> np.ndarray:
+        """Value ids that contain every n-gram of q (a superset of the matches)."""
+        n = self.ngram
+        if len(q) < n:
+            return np.arange(len(self.values))
+        grams = self._gram_postings()
+        empty = np.empty(0, dtype=np.int64)
+        for gram in {q[i:i + n] for i in range(len(q) - n + 1)} & self._new_grams.keys():
+            grams[gram] = np.concatenate([grams.get(gram, empty), np.asarray(self._new_grams.pop(gram), dtype=np.int64)])
+        # rarest n-grams first keeps the intersections small
+        lists = sorted((grams.get(q[i:i + n], empty) for i in range(len(q) - n + 1)), key=len)
+        ids = lists[0]
+        for other in lists[1:]:
+            if not len(ids):
+                break
+            ids = np.intersect1d(ids, other, assume_unique=True)
+        return ids
+
+    def _extend_joined(self, values: Sequence[str]) -> None:
+        # the trailing "" is not in the joined string; values are appended after the last
+        lengths = np.fromiter((len(v) + 1 for v in values), dtype=np.int64, count=len(values))
+        starts = len(self._joined) + 1 + np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        self._joined += "\0" + "\0".join(values)
+        self._starts = np.concatenate([self._starts, starts])
+
+    def _scan(self, q: str) -> np.ndarray:
+        if self._joined is None:
+            # \0 never occurs in a log line, so a match cannot span two values
+            values = self.values[:-1]
+            self._joined = "\0".join(values)
+            lengths = np.fromiter((len(v) + 1 for v in values), dtype=np.int64, count=len(values))
+            self._starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        joined, starts, found = self._joined, self._starts, []
+        pos = joined.find(q)
+        while pos >= 0:
+            value_id = int(np.searchsorted(starts, pos, side="right")) - 1
+            found.append(value_id)
+            if value_id + 1 >= len(starts):
+                break
+            pos = joined.find(q, int(starts[value_id + 1]))
+        return np.asarray(found, dtype=np.int64)
+
+    def find(self, q: str, within: Optional[np.ndarray] = None) -> np.ndarray:
+        """Boolean array over values: contains the literal q. `within` limits the value ids checked."""
+        found = np.zeros(len(self.values), dtype=bool)
+        values = self.values
+        if within is None and not q:
+            found[:] = True
+        elif within is None and not self.use_grams:
+            found[self._scan(q)] = True
+        else:
+            ids = self._candidates(q) if within is None else within
+            found[[i for i in ids.tolist() if q in values[i]]] = True
+        return found
+
+
+class SearchIndex:
+    """
+    df: parsed frame; `mask(q)` returns a boolean array aligned with its rows.
+    Recent query results are kept, and a query that extends a cached one (typing one more
+    character) only re-checks the values the shorter query matched.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        columns: Sequence[str] = SEARCH_COLUMNS,
+        ngram: int = 3,
+        max_gram_values: int = 20_000,
+        max_cached_queries: int = 32,
+    ):
+        self.n_rows = len(df)
+        self.columns = {c: _ColumnIndex(df[c], ngram, max_gram_values) for c in columns if c in df.columns}
+        self.max_cached_queries = max_cached_queries
+        self._hits: "OrderedDict[str, Dict[str, np.ndarray]]" = OrderedDict()
+
+    def extend(self, new_rows: pd.DataFrame) -> "SearchIndex":
+        """Add rows appended to the frame the index was built on; returns the index."""
+        for name, index in self.columns.items():
+            index.extend(new_rows[name])
+        self.n_rows += len(new_rows)
+        # cached hits are per value, and there are new values
+        self._hits.clear()
+        return self
+
+    def _literal_hits(self, q: str) -> Dict[str, np.ndarray]:
+        # narrowest cached query contained in q, if any
+        base = None
+        for prev in self._hits:
+            if prev and prev in q and not (_REGEX_CHARS & set(prev)) and (base is None or len(prev) > len(base)):
+                base = prev
+        return {
+            name: index.find(q, None if base is None else np.flatnonzero(self._hits[base][name]))
+            for name, index in self.columns.items()
+        }
+
+    def _regex_hits(self, q: str) -> Dict[str, np.ndarray]:
+        return {
+            name: np.asarray(pd.Index(index.values, dtype=object).str.contains(q), dtype=bool)
+            for name, index in self.columns.items()
+        }
+
+    def value_hits(self, q: str) -> Dict[str, np.ndarray]:
+        """Per column: which distinct values (plus trailing missing/"") match q."""
+        if q in self._hits:
+            self._hits.move_to_end(q)
+            return self._hits[q]
+        hits = None
+        if _REGEX_CHARS & set(q):
+            try:
+                re.compile(q)
+                hits = self._regex_hits(q)
+            except re.error:
+                # not a valid pattern: search it literally instead of failing
+                pass
+        if hits is None:
+            hits = self._literal_hits(q)
+        self._hits[q] = hits
+        while len(self._hits) > self.max_cached_queries:
+            self._hits.popitem(last=False)
+        return hits
+
+    def mask(self, q: str) -> np.ndarray:
+        """Rows where any indexed column contains q (case-insensitive; q may be a regex)."""
+        q = q.lower()
+        out = np.zeros(self.n_rows, dtype=bool)
+        for name, found in self.value_hits(q).items():
+            # codes of -1 (missing) index the trailing "" entry
+            out |= found[self.columns[name].codes]
+        return out
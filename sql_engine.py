@@ -0,0 +1,226 @@
+# sql_engine.py
+"""
+SQL over the parsed occurrences, in an embedded engine built once per parsed log.
+Tables: `occurrences` (one row per parsed occurrence, columns as in SQL_COLUMNS) and
+`categories` (category_key, category, description) for joins.
+
+With DuckDB the frame is handed over as an Arrow table: categorical columns become
+dictionary arrays over the frame's own codes, so only their distinct values are converted;
+text the parser keeps as plain objects (message and exc_message when mostly distinct, see
+parser._compact) is copied in full, once per engine. Queries (GROUP BY, window functions,
+joins) run vectorized on it. Without pyarrow
+DuckDB scans the pandas frame itself, which re-reads the categories on every query.
+Without DuckDB the rows are copied once into an in-memory SQLite database (slow for
+large logs, but always available); `date_trunc(unit, timestamp)` is added there so the
+saved queries run on both engines.
+
+Queries come from the browser, so the engines are locked down: only a single SELECT
+(or WITH ... SELECT) statement runs, DuckDB has no file system or network access, and
+SQLite's authorizer allows nothing but reading (no ATTACH, PRAGMA or writes).
+
+SAVED_QUERIES are offered in the app; add more in a JSON file ({"name": "SQL", ...})
+named by LOG_ANALYSER_SQL_QUERIES.
+"""
+
+import importlib.util
+import json
+import os
+import re
+import sqlite3
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from errors_mapping import CATEGORY_MAPPING
+from instrument import stage
+
+# imported when an engine is built (both are slow to import)
+DUCKDB_AVAILABLE = importlib.util.find_spec("duckdb") is not None
+ARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+QUERIES_ENV = "LOG_ANALYSER_SQL_QUERIES"
+# rows of a result kept for display
+MAX_RESULT_ROWS = 10_000
+# no file or network access, and the query cannot turn it back on
+DUCKDB_CONFIG = {"enable_external_access": False, "lock_configuration": True}
+# the only SQLite actions a query may take
+_SQLITE_ALLOWED = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+# whitespace, comments and opening parentheses before a statement's first keyword
+_LEADING_RE = re.compile(r"(?:\s+|--[^\n]*|/\*.*?\*/|\()*", re.S)
+
+# parser column -> column of the occurrences table
+SQL_COLUMNS = {
+    "timestamp": "timestamp",
+    "source": "source",
+    "module": "module",
+    "level": "level",
+    "message": "message",
+    "exception": "exception",
+    "exc_message": "exception_message",
+    "category_key": "category_key",
+    "category": "category",
+    "fingerprint": "fingerprint",
+    "raw_traceback": "traceback",
+}
+
+SAVED_QUERIES: Dict[str, str] = {
+    "Most frequent exceptions": """\
+SELECT exception, count(*) AS occurrences, min(timestamp) AS first_seen, max(timestamp) AS last_seen
+FROM occurrences
+WHERE exception IS NOT NULL
+GROUP BY exception
+ORDER BY occurrences DESC
+LIMIT 20""",
+    "Occurrences per hour and level": """\
+SELECT date_trunc('hour', timestamp) AS hour, level, count(*) AS occurrences
+FROM occurrences
+WHERE timestamp IS NOT NULL
+GROUP BY 1, 2
+ORDER BY 1, 2""",
+    "Running total per exception (window)": """\
+SELECT hour, exception, n,
+       sum(n) OVER (PARTITION BY exception ORDER BY hour) AS running_total
+FROM (
+    SELECT date_trunc('hour', timestamp) AS hour, exception, count(*) AS n
+    FROM occurrences
+    WHERE exception IS NOT NULL AND timestamp IS NOT NULL
+    GROUP BY 1, 2
+) AS hourly
+ORDER BY exception, hour""",
+    "Busiest minutes (ERROR and CRITICAL)": """\
+SELECT date_trunc('minute', timestamp) AS minute, count(*) AS occurrences
+FROM occurrences
+WHERE level IN ('ERROR', 'CRITICAL') AND timestamp IS NOT NULL
+GROUP BY 1
+ORDER BY occurrences DESC
+LIMIT 20""",
+    "Categories with descriptions (join)": """\
+SELECT c.category, c.description, count(o.category_key) AS occurrences
+FROM categories AS c
+LEFT JOIN occurrences AS o ON o.category_key = c.category_key
+GROUP BY c.category, c.description
+ORDER BY occurrences DESC""",
+    "Modules by distinct exceptions": """\
+SELECT module, count(DISTINCT exception) AS exception_types, count(*) AS occurrences
+FROM occurrences
+GROUP BY module
+ORDER BY exception_types DESC, occurrences DESC""",
+}
+
+# "YYYY-MM-DD HH:MM:SS" prefix lengths for SQLite's date_trunc
+_TRUNC_LENGTHS = {"year": 4, "month": 7, "day": 10, "hour": 13, "minute": 16, "second": 19}
+_TRUNC_FILL = "0000-01-01 00:00:00"
+
+
+def _sqlite_date_trunc(unit: str, value: Optional[str]) -> Optional[str]:
+    """date_trunc for SQLite's ISO timestamp text ("2024-01-01 12:34:56.789")."""
+    if value is None:
+        return None
+    n = _TRUNC_LENGTHS.get(str(unit).lower())
+    if n is None:
+        raise ValueError(f"date_trunc: unknown unit {unit!r}")
+    return value[:n] + _TRUNC_FILL[n:]
+
+
+def _check_select(sql: str) -> None:
+    """ValueError unless sql starts as a SELECT or WITH statement."""
+    words = sql[_LEADING_RE.match(sql).end():].split(None, 1)
+    if not words or words[0].lower() not in ("select", "with"):
+        raise ValueError("only a single SELECT (or WITH ... SELECT) statement can be run")
+
+
+def _sqlite_authorizer(action: int, *args) -> int:
+    return sqlite3.SQLITE_OK if action in _SQLITE_ALLOWED else sqlite3.SQLITE_DENY
+
+
+def query_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """df's SQL_COLUMNS under their SQL names; the columns are shared, not copied."""
+    return pd.DataFrame({SQL_COLUMNS[c]: df[c] for c in SQL_COLUMNS if c in df.columns}, copy=False)
+
+
+def categories_frame() -> pd.DataFrame:
+    return pd.DataFrame(
+        [(key, spec["category"], spec["description"]) for key, spec in CATEGORY_MAPPING.items()],
+        columns=["category_key", "category", "description"],
+    )
+
+
+class SqlEngine:
+    """
+    An embedded SQL engine holding one parsed log. `engine` is "duckdb" or "sqlite".
+    query(sql) -> (result frame, truncated); engine errors are raised as ValueError.
+    """
+
+    def __init__(self, df: pd.DataFrame, prefer_duckdb: bool = True):
+        occurrences = query_frame(df)
+        with stage("sql: register", rows=len(df)):
+            if DUCKDB_AVAILABLE and prefer_duckdb:
+                self._open_duckdb(occurrences)
+            else:
+                self._open_sqlite(occurrences)
+
+    def _open_duckdb(self, occurrences: pd.DataFrame):
+        import duckdb
+
+        self.engine = "duckdb"
+        self._errors: Tuple = (duckdb.Error,)
+        self._select = duckdb.StatementType.SELECT
+        self._con = duckdb.connect(":memory:", config=DUCKDB_CONFIG)
+        if ARROW_AVAILABLE:
+            import pyarrow as pa
+
+            # categoricals are converted per distinct value, object columns row by row
+            occurrences = pa.Table.from_pandas(occurrences, preserve_index=False)
+        # registered objects are scanned in place; the engine keeps a reference
+        self._tables = {"occurrences": occurrences, "categories": categories_frame()}
+        for name, table in self._tables.items():
+            self._con.register(name, table)
+
+    def _open_sqlite(self, occurrences: pd.DataFrame):
+        self.engine = "sqlite"
+        self._errors = (sqlite3.Error,)
+        # Streamlit reruns a session on different threads, one at a time
+        self._con = sqlite3.connect(":memory:", check_same_thread=False)
+        self._con.create_function("date_trunc", 2, _sqlite_date_trunc, deterministic=True)
+        # SQLite stores text: categoricals are expanded and timestamps written as ISO text
+        occurrences = occurrences.astype({c: object for c in occurrences.columns
+                                          if isinstance(occurrences[c].dtype, pd.CategoricalDtype)})
+        occurrences.to_sql("occurrences", self._con, index=False, chunksize=50_000)
+        categories_frame().to_sql("categories", self._con, index=False)
+        # from here on queries may only read (set after the tables are written)
+        self._con.set_authorizer(_sqlite_authorizer)
+
+    def query(self, sql: str, max_rows: int = MAX_RESULT_ROWS) -> Tuple[pd.DataFrame, bool]:
+        """Run one SELECT statement; its first `max_rows` rows, and whether there were more."""
+        _check_select(sql)
+        with stage(f"sql: query ({self.engine})") as rec:
+            try:
+                if self.engine == "duckdb":
+                    statements = self._con.extract_statements(sql)
+                    if len(statements) != 1 or statements[0].type != self._select:
+                        raise ValueError("only a single SELECT (or WITH ... SELECT) statement can be run")
+                    # LIMIT is pushed into the query
+                    result = self._con.sql(sql).limit(max_rows + 1).df()
+                else:
+                    # sqlite3 runs one statement only; the authorizer rejects anything but reads
+                    cursor = self._con.execute(sql)
+                    columns = [d[0] for d in cursor.description or ()]
+                    result = pd.DataFrame.from_records(cursor.fetchmany(max_rows + 1), columns=columns)
+            except self._errors as exc:
+                raise ValueError(str(exc)) from exc
+            rec["rows"] = len(result)
+        truncated = len(result) > max_rows
+        return result.iloc[:max_rows], truncated
+
+
+def load_queries(path: Optional[str]) -> Dict[str, str]:
+    """Saved queries from a JSON file holding {"name": "SQL", ...}. No path, none."""
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as fh:
+        queries = json.load(fh)
+    if not isinstance(queries, dict) or not all(isinstance(v, str) for v in queries.values()):
+        raise ValueError(f"{path}: expected a JSON object of query name -> SQL")
+    return queries
+
+
+SAVED_QUERIES.update(load_queries(os.environ.get(QUERIES_ENV)))
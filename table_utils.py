@@ -1,72 +1,191 @@
 # table_utils.py
 """
-Helpers to show either AgGrid (with allow_unsafe_jscode=True) if available,
-or a plain Streamlit dataframe with a detail panel.
+Helpers to show either AgGrid if available, or a plain Streamlit dataframe, with a
+detail panel. Rows are paginated, sorted and filtered server-side.
 """
 
+import importlib.util
+from typing import Optional
+
+import numpy as np
 import streamlit as st
 import pandas as pd
 
-try:
-    from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
-    AGGRID_AVAILABLE = True
-except Exception:
-    AGGRID_AVAILABLE = False
+from instrument import stage
+
+# st_aggrid is imported only when a grid is actually shown (it is slow to import)
+AGGRID_AVAILABLE = importlib.util.find_spec("st_aggrid") is not None
+
+
+def expand_categoricals(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copy of df with categorical columns (the parser's compact schema) turned back into
+    plain object columns, for consumers that need real strings (fillna(""), AgGrid, ...).
+    """
+    out = df.copy(deep=False)
+    for col in out.columns:
+        if isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype(object)
+    return out
+
+
+# parser column -> column name shown in the table
+DISPLAY_COLUMNS = {
+    "timestamp": "timestamp",
+    "source": "source",
+    "module": "module",
+    "level": "level",
+    "exception": "exception",
+    "exc_message": "exception_message",
+}
+PAGE_SIZES = (25, 50, 100, 200)
+
 
+def _sort_order(col: pd.Series, ascending: bool) -> np.ndarray:
+    """Row positions sorting col (stable, missing values last)."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        # rank categories as strings: a concatenated frame's categories need not be sorted
+        categories = col.cat.categories
+        ranks = np.empty(len(categories), dtype=np.int64)
+        ranks[np.argsort(categories.astype(str), kind="stable")] = np.arange(len(categories))
+        codes = col.cat.codes.to_numpy()
+        key = pd.Series(np.where(codes >= 0, ranks[codes], -1)).where(codes >= 0)
+    else:
+        key = col.reset_index(drop=True)
+    return key.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+
+
+def _contains(col: pd.Series, text: str) -> np.ndarray:
+    """Case-insensitive substring match; categoricals are matched on their categories only."""
+    text = text.lower()
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        hits = np.append(np.asarray(col.cat.categories.astype(str).str.lower().str.contains(text, regex=False), dtype=bool), False)
+        return hits[col.cat.codes.to_numpy()]
+    return col.astype(str).str.lower().str.contains(text, regex=False).to_numpy() & col.notna().to_numpy()
 
-def show_table(display_df: pd.DataFrame, enable_aggrid: bool = True, show_traceback_default: bool = False):
+
+def table_positions(df: pd.DataFrame, sort_by: Optional[str] = None, ascending: bool = True,
+                    filter_col: Optional[str] = None, filter_text: str = "") -> np.ndarray:
+    """
+    Row positions of df after the table's filter and sort. Only positions are computed;
+    the caller slices the page and the columns it shows.
+    """
+    positions = np.arange(len(df))
+    if filter_col and filter_text:
+        positions = positions[_contains(df[filter_col], filter_text)]
+    if sort_by:
+        positions = positions[_sort_order(df[sort_by].iloc[positions], ascending)]
+    return positions
+
+
+def _selected_row(rows, n_rows: int) -> int:
+    """
+    The selected row of a st.dataframe selection, 0 without one. The selection outlives
+    the rows it was made on (another page, sort, filter or log), so out-of-range picks
+    fall back to the first row.
     """
-    display_df: DataFrame with columns: timestamp_text, timestamp, module, level, exception, exception_message, traceback
-    enable_aggrid: if True and st-aggrid installed, use AgGrid with JsCode renderer (allow_unsafe_jscode=True).
+    return rows[0] if rows and 0 <= rows[0] < n_rows else 0
+
+
+def _show_details(df: pd.DataFrame, position: int, show_traceback_default: bool):
+    # the traceback is looked up for this one row only
+    row = df.iloc[position]
+    st.markdown("### Selected occurrence details")
+    st.write(f"Timestamp: {row['timestamp'] if pd.notna(row['timestamp']) else None}")
+    st.write(f"Module: {row['module']}")
+    st.write(f"Level: {row['level']}")
+    st.write(f"Exception: {row['exception']}")
+    st.write(f"Message: {row['exc_message']}")
+    tb = row.get("raw_traceback")
+    if isinstance(tb, str) and tb:
+        if show_traceback_default:
+            st.code(tb)
+        else:
+            with st.expander("Traceback"):
+                st.code(tb)
+
+
+def show_table(df: pd.DataFrame, enable_aggrid: bool = True, show_traceback_default: bool = False, key: str = "table"):
+    """
+    df: parsed rows to list (parser column names; see DISPLAY_COLUMNS).
+    enable_aggrid: if True and st-aggrid installed, use AgGrid for the page.
+    Pagination, sorting and filtering happen here, on the server: only the rows of the
+    current page are sent to the browser, and tracebacks only for the selected row.
     Returns: None (renders to streamlit).
     """
+    columns = [c for c in DISPLAY_COLUMNS if c in df.columns]
+    c1, c2, c3, c4, c5 = st.columns([2, 1, 2, 2, 1])
+    sort_label = c1.selectbox("Sort by", ["(log order)"] + [DISPLAY_COLUMNS[c] for c in columns], key=f"{key}_sort")
+    descending = c2.checkbox("Descending", value=False, key=f"{key}_desc")
+    filter_label = c3.selectbox("Filter column", [DISPLAY_COLUMNS[c] for c in columns], index=len(columns) - 1, key=f"{key}_filter_col")
+    filter_text = c4.text_input("contains", key=f"{key}_filter_text").strip()
+    page_size = c5.selectbox("Rows/page", PAGE_SIZES, index=1, key=f"{key}_page_size")
+
+    by_label = {DISPLAY_COLUMNS[c]: c for c in columns}
+    sort_by = by_label.get(sort_label)
+    filter_col = by_label[filter_label]
+    with stage("table: filter and sort", rows=len(df)):
+        positions = table_positions(df, sort_by, not descending, filter_col, filter_text)
+    n_pages = max(1, -(-len(positions) // page_size))
+    # the key changes with the page count, so a shrinking result never leaves the page out of range
+    page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1, key=f"{key}_page_{n_pages}") - 1
+    st.caption(f"Page {page + 1} of {n_pages} ({len(positions)} rows)")
+    positions = positions[page * page_size:(page + 1) * page_size]
+    page_df = df.iloc[positions][columns].rename(columns=DISPLAY_COLUMNS).reset_index(drop=True)
+    if page_df.empty:
+        st.info("No rows match the table filter.")
+        return
+
+    with stage("table: page", rows=len(page_df)):
+        selected = _show_page(page_df, enable_aggrid, key)
+    _show_details(df, int(positions[selected]), show_traceback_default)
+
+
+def _show_page(page_df: pd.DataFrame, enable_aggrid: bool, key: str) -> int:
+    """Render one page of rows; returns the position of the selected row on the page."""
+    selected = 0
     if AGGRID_AVAILABLE and enable_aggrid:
-        grid_df = display_df.fillna("")
+        from st_aggrid import AgGrid, GridOptionsBuilder
+
+        grid_df = expand_categoricals(page_df).fillna("")
+        grid_df["row"] = np.arange(len(grid_df))
 
         gb = GridOptionsBuilder.from_dataframe(grid_df)
-        gb.configure_pagination(paginationAutoPageSize=False, paginationPageSize=20)
-        gb.configure_default_column(resizable=True, sortable=True, filter=True, wrapText=True)
-
-        js_renderer = JsCode(
-            """
-            function(params) {
-              if (!params.value) { return ''; }
-              var safe = (params.value + '').replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
-              return `<pre style="white-space: pre-wrap; font-family: monospace; font-size:12px;">${safe}</pre>`;
-            }
-            """
-        )
-
-        if "traceback" in grid_df.columns:
-            try:
-                gb.configure_column("traceback", cellRenderer=js_renderer)
-            except Exception:
-                pass
+        gb.configure_default_column(resizable=True, sortable=False, filter=False, wrapText=True)
+        gb.configure_column("row", hide=True)
+        gb.configure_selection("single")
 
         grid_options = gb.build()
-        grid_response = AgGrid(grid_df, gridOptions=grid_options, enable_enterprise_modules=False, fit_columns_on_grid_load=True, allow_unsafe_jscode=True)
-        selected = grid_response.get("selected_rows", [])
-        if selected:
-            sel = selected[0]
-            st.markdown("### Selected occurrence details")
-            st.write(f"Timestamp: {sel.get('timestamp_text')}")
-            st.write(f"Module: {sel.get('module')}")
-            st.write(f"Level: {sel.get('level')}")
-            st.write(f"Exception: {sel.get('exception')}")
-            st.write(f"Message: {sel.get('exception_message')}")
-            tb = sel.get("traceback") or ""
-            if tb:
-                st.code(tb)
+        grid_response = AgGrid(grid_df, gridOptions=grid_options, enable_enterprise_modules=False, fit_columns_on_grid_load=True)
+        rows = grid_response.get("selected_rows")
+        if rows is not None and len(rows):
+            first = rows.iloc[0] if isinstance(rows, pd.DataFrame) else rows[0]
+            selected = _selected_row([int(first["row"])], len(page_df))
     else:
-        st.dataframe(display_df.drop(columns=["traceback"]), height=420)
-        if len(display_df) > 0:
-            idx = st.number_input("Show detail for row index (0..N-1)", min_value=0, max_value=max(0, len(display_df) - 1), value=0, step=1)
-            sel_row = display_df.reset_index(drop=True).iloc[idx]
-            st.markdown("### Selected occurrence details")
-            st.write(f"Timestamp: {sel_row['timestamp_text']}")
-            st.write(f"Module: {sel_row['module']}")
-            st.write(f"Level: {sel_row['level']}")
-            st.write(f"Exception: {sel_row['exception']}")
-            st.write(f"Message: {sel_row['exception_message']}")
-            if show_traceback_default and sel_row.get("traceback"):
-                st.code(sel_row["traceback"])
+        event = st.dataframe(page_df, height=420, on_select="rerun", selection_mode="single-row", key=f"{key}_grid")
+        selected = _selected_row(event.selection.rows, len(page_df))
+    return selected
+
+
+def show_groups(groups: pd.DataFrame, show_traceback_default: bool = False, key: str = "groups"):
+    """
+    groups: output of parser.group_occurrences (one row per traceback fingerprint).
+    Lists the groups without their tracebacks; the selected group's representative
+    traceback is shown below.
+    """
+    if groups.empty:
+        st.info("No fingerprinted occurrences for the current filter.")
+        return
+    listing = groups.drop(columns=["raw_traceback"]).rename(columns={"exc_message": "example_message"})
+    event = st.dataframe(listing, height=420, on_select="rerun", selection_mode="single-row", key=f"{key}_grid")
+    row = groups.iloc[_selected_row(event.selection.rows, len(groups))]
+    st.markdown("### Selected group")
+    st.write(f"Exception: {row['exception']} ({row['count']} occurrences, {row['first_seen']} .. {row['last_seen']})")
+    st.write(f"Example message: {row['exc_message']}")
+    tb = row["raw_traceback"]
+    if isinstance(tb, str) and tb:
+        if show_traceback_default:
+            st.code(tb)
+        else:
+            with st.expander("Representative traceback"):
+                st.code(tb)
@@ -0,0 +1,94 @@
+# test_cli.py
+"""Exit status and counts of the headless analyser (cli.py) on small sample logs."""
+
+import gzip
+import json
+
+import pytest
+
+import cli
+
+LOG = """\
+2024-03-01 00:00:01,000 - app.api - INFO - processed request id=1 in 12ms
+2024-03-01 00:00:02,000 - app.api - ERROR - Unhandled error in handler
+Traceback (most recent call last):
+  File "/srv/app/api.py", line 3, in handler
+    do_thing(x)
+KeyError: 'k1'
+2024-03-01 00:00:03,000 - worker - INFO - processed request id=2 in 9ms
+2024-03-01 00:00:04,000 - worker - DEBUG - polling queue
+2024-03-01 00:00:05,000 - db.pool - ERROR - Unhandled error in handler
+Traceback (most recent call last):
+  File "/srv/app/pool.py", line 8, in connect
+    open_socket()
+TimeoutError: connection timed out
+2024-03-01 00:00:06,000 - auth - INFO - login ok
+"""
+
+
+@pytest.fixture
+def good_log(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_text(LOG, encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def truncated_gz(tmp_path):
+    path = tmp_path / "old.log.gz"
+    data = gzip.compress(LOG.encode() * 50)
+    path.write_bytes(data[:len(data) // 2])
+    return str(path)
+
+
+def run_cli(capsys, *args):
+    code = cli.main([*args, "--workers", "1"])
+    return code, capsys.readouterr()
+
+
+def test_counts_only_entries_with_an_exception(capsys, good_log):
+    code, out = run_cli(capsys, good_log)
+    assert code == cli.EXIT_OK
+    summary = json.loads(out.out)
+    occurrences = summary["files"][good_log]["occurrences"]
+    assert occurrences == 2
+    assert occurrences == sum(rec["count"] for rec in summary["combined"]["suberrors"])
+
+
+@pytest.mark.parametrize("threshold, expected", [(2, cli.EXIT_ALERT), (3, cli.EXIT_OK)])
+def test_threshold_compares_exception_count(capsys, good_log, threshold, expected):
+    code, _ = run_cli(capsys, good_log, "--alert-threshold", str(threshold))
+    assert code == expected
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("KeyError", cli.EXIT_ALERT),
+    ("Type_2_Runtime", cli.EXIT_ALERT),
+    ("ZeroDivisionError", cli.EXIT_OK),
+])
+def test_alert_on_name(capsys, good_log, name, expected):
+    code, out = run_cli(capsys, good_log, "--alert-on", name)
+    assert code == expected
+    assert ("alert:" in out.err) == (expected == cli.EXIT_ALERT)
+
+
+def test_unreadable_file_is_an_error(capsys, truncated_gz):
+    code, out = run_cli(capsys, truncated_gz)
+    assert code == cli.EXIT_ERROR
+    assert truncated_gz in json.loads(out.out)["errors"]
+
+
+def test_alert_wins_over_unreadable_file(capsys, good_log, truncated_gz):
+    code, out = run_cli(capsys, good_log, truncated_gz, "--alert-on", "KeyError")
+    assert code == cli.EXIT_ALERT
+    assert "error:" in out.err and "alert:" in out.err
+
+
+def test_unreadable_file_without_alert_is_an_error(capsys, good_log, truncated_gz):
+    code, _ = run_cli(capsys, good_log, truncated_gz, "--alert-on", "ZeroDivisionError")
+    assert code == cli.EXIT_ERROR
+
+
+def test_missing_input_is_an_error(capsys, tmp_path):
+    code, _ = run_cli(capsys, str(tmp_path / "missing.log"))
+    assert code == cli.EXIT_ERROR